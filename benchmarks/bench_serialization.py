@@ -0,0 +1,78 @@
+"""
+Compare the default response path with EntityBatch for large entity lists.
+
+The default path mirrors what FastAPI does for ``response_model=List[Entity]``
+when the handler returns plain dicts: validate every entity, run
+``jsonable_encoder`` and encode with the stdlib ``json`` module. The fast path
+validates once into an EntityBatch and encodes it straight to bytes.
+
+Usage:
+    poetry run python benchmarks/bench_serialization.py
+"""
+
+import json
+import sys
+import timeit
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.models import Entity, EntityBatch  # noqa: E402
+
+SIZES = [1_000, 10_000, 100_000]
+# Entities found per paragraph; every entity carries its paragraph as context
+ENTITIES_PER_PARAGRAPH = 8
+PARAGRAPH = (
+    "Genome-wide association studies have identified rare mutations in CCR5 "
+    "that confer resilience against HIV infection, while paracetamol remains "
+    "the first-line treatment for mild pain in these cohorts. "
+) * 3
+
+entity_list_adapter = TypeAdapter(List[Entity])
+
+
+def make_entities(count: int) -> List[Dict[str, Any]]:
+    return [
+        {
+            "entity": f"entity-{i}",
+            "context": f"[{i // ENTITIES_PER_PARAGRAPH}] {PARAGRAPH}",
+            "start": i * 12,
+            "end": i * 12 + 8,
+        }
+        for i in range(count)
+    ]
+
+
+def default_path(entities: List[Dict[str, Any]]) -> bytes:
+    validated = entity_list_adapter.validate_python(entities)
+    return json.dumps(jsonable_encoder(validated)).encode("utf-8")
+
+
+def batch_path(entities: List[Dict[str, Any]]) -> bytes:
+    return EntityBatch.from_dicts(entities).to_json_bytes()
+
+
+def best_of(fn: Callable[[List[Dict[str, Any]]], bytes], entities, repeat: int):
+    return min(timeit.repeat(lambda: fn(entities), number=1, repeat=repeat))
+
+
+def main() -> None:
+    print(f"{'entities':>10} {'default (ms)':>14} {'batch (ms)':>12} {'speedup':>9}")
+    for size in SIZES:
+        entities = make_entities(size)
+        assert json.loads(default_path(entities)) == json.loads(batch_path(entities))
+        repeat = 5 if size < 100_000 else 3
+        default = best_of(default_path, entities, repeat)
+        batch = best_of(batch_path, entities, repeat)
+        print(
+            f"{size:>10} {default * 1000:>14.1f} {batch * 1000:>12.1f} "
+            f"{default / batch:>8.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
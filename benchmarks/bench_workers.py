@@ -0,0 +1,127 @@
+"""
+Measure how extraction throughput (docs/sec) scales with the number of workers.
+
+Starts the pre-forking server from src.serve with 1, 2, 4, ... workers (up to
+the available CPUs) and uploads a batch of distinct multi-page PDFs from
+concurrent clients. The Vertex AI model is replaced by a stub with a fixed
+latency so the numbers reflect parsing and serving, not the remote model.
+Result caching and request coalescing don't apply because every PDF differs.
+
+Usage:
+    poetry run python benchmarks/bench_workers.py [--docs 48] [--pages 30]
+"""
+
+import argparse
+import os
+import signal
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+import httpx
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from tests.utils import write_text_pdf  # noqa: E402
+
+PORT = 8765
+MODEL_LATENCY = 0.005
+
+
+def stub_generate(_prompt):
+    time.sleep(MODEL_LATENCY)
+    response = MagicMock()
+    response.text = '[{"entity": "CCR5", "context": "", "start": 0, "end": 4}]'
+    return response
+
+
+def start_server(workers: int) -> int:
+    """Fork a process running src.serve with a stubbed model; return its pid."""
+    pid = os.fork()
+    if pid == 0:
+        os.environ.setdefault("GCP_PROJECT_ID", "benchmark")
+        os.environ.setdefault("GCP_LOCATION", "us-central1")
+        os.environ.pop("RESULT_CACHE_PATH", None)
+        # Split the model call limits between workers as src.serve.main() does
+        os.environ["SERVE_WORKERS"] = str(workers)
+        with patch("vertexai.init"), patch("src.extractor.GenerativeModel") as model:
+            model.return_value.generate_content.side_effect = stub_generate
+            from src.app import app
+            from src.serve import serve
+
+            serve(app, host="127.0.0.1", port=PORT, workers=workers)
+        os._exit(0)
+    return pid
+
+
+def wait_until_healthy(timeout: float = 60) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"http://127.0.0.1:{PORT}/health").status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("Server did not become healthy")
+
+
+def upload(client: httpx.Client, pdf: bytes, name: str) -> None:
+    response = client.post(
+        f"http://127.0.0.1:{PORT}/api/v1/extract",
+        files={"file": (name, pdf, "application/pdf")},
+        timeout=300,
+    )
+    response.raise_for_status()
+
+
+def run(workers: int, pdfs, clients: int) -> float:
+    pid = start_server(workers)
+    try:
+        wait_until_healthy()
+        with httpx.Client() as client, ThreadPoolExecutor(clients) as pool:
+            start = time.perf_counter()
+            list(
+                pool.map(
+                    lambda item: upload(client, item[1], f"doc-{item[0]}.pdf"),
+                    enumerate(pdfs),
+                )
+            )
+            elapsed = time.perf_counter() - start
+    finally:
+        os.kill(pid, signal.SIGTERM)
+        os.waitpid(pid, 0)
+    return len(pdfs) / elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--docs", type=int, default=48)
+    parser.add_argument("--pages", type=int, default=30)
+    args = parser.parse_args()
+
+    from src.serve import default_workers
+
+    cpus = default_workers()
+    counts = sorted({1, *(n for n in (2, 4, 8, 16, 32) if n <= cpus), cpus})
+
+    with tempfile.TemporaryDirectory() as tmp:
+        base = write_text_pdf(Path(tmp) / "base.pdf", args.pages).read_bytes()
+    # Trailing comments keep the PDFs valid but give each a distinct hash
+    pdfs = [base + b"%% benchmark document %d\n" % i for i in range(args.docs)]
+
+    print(f"{args.docs} documents x {args.pages} pages, {cpus} CPUs available")
+    print(f"{'workers':>8} {'docs/sec':>10} {'speedup':>9}")
+    baseline = None
+    for workers in counts:
+        rate = run(workers, pdfs, clients=max(workers * 2, 4))
+        baseline = baseline or rate
+        print(f"{workers:>8} {rate:>10.2f} {rate / baseline:>8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,12 +6,26 @@ This package provides tools for extracting medical entities from PDF documents.
 Modules:
     extractor: Contains the Extractor class for medical entity extraction
     pdf_parser: Contains the PDFParser class for PDF text extraction
+    models: Contains the Entity schema and the compact EntityBatch container
+    entity_index: Contains the EntityIndex persistent cross-document index
+    result_cache: Contains the ResultCache shared by worker processes
 """
 
 from .extractor import Extractor
 from .pdf_parser import PDFParser
-from .models import Entity
+from .models import Entity, EntityBatch, EntityContext, EntityMatch
+from .entity_index import EntityIndex
+from .result_cache import ResultCache
 
 __version__ = "1.0.0"
 __author__ = "Your Name"
-__all__ = ["Extractor", "PDFParser", "Entity"]
+__all__ = [
+    "Extractor",
+    "PDFParser",
+    "Entity",
+    "EntityBatch",
+    "EntityContext",
+    "EntityMatch",
+    "EntityIndex",
+    "ResultCache",
+]
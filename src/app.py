@@ -1,11 +1,34 @@
 from src import PDFParser
 from src import Extractor
 from src import Entity
+from src import EntityBatch
+from src import EntityContext
+from src import EntityIndex
+from src import EntityMatch
+from src.profiling import run_profiled
+from src.result_cache import ResultCache
+from src.scheduler import ModelCallScheduler
+from src.single_flight import AsyncSingleFlight
 
-from fastapi import FastAPI, File, UploadFile, HTTPException, Response, status
-from typing import List
+from fastapi import (
+    FastAPI,
+    File,
+    Header,
+    Query,
+    UploadFile,
+    HTTPException,
+    Response,
+    status,
+)
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
+from typing import List, Optional
 import uvicorn
+import hashlib
+import hmac
+import json
 import tempfile
+import time
 from loguru import logger
 from dotenv import load_dotenv
 import os
@@ -16,10 +39,71 @@ load_dotenv()
 GCP_PROJECT_ID = os.getenv("GCP_PROJECT_ID")
 GCP_LOCATION = os.getenv("GCP_LOCATION")
 GCP_MODEL_NAME = "gemini-1.0-pro-001"
+# Low-memory PDF parsing releases each page as soon as its text is extracted,
+# needed for large scanned supplements that otherwise OOM the container
+PDF_LOW_MEMORY = os.getenv("PDF_LOW_MEMORY", "false").lower() == "true"
+PDF_MAX_MEMORY_MB = (
+    int(os.getenv("PDF_MAX_MEMORY_MB")) if os.getenv("PDF_MAX_MEMORY_MB") else None
+)
+# Model calls in flight across all requests, and optionally per client
+# (identified by the X-Client-ID header). Small documents are served first.
+MODEL_MAX_CONCURRENCY = int(os.getenv("MODEL_MAX_CONCURRENCY", "4"))
+CLIENT_MAX_CONCURRENCY = (
+    int(os.getenv("CLIENT_MAX_CONCURRENCY"))
+    if os.getenv("CLIENT_MAX_CONCURRENCY")
+    else None
+)
+# Number of worker processes, set by src.serve before importing the app. Each
+# worker schedules its own model calls, so the limits above are split evenly
+# between them (rounded down, at least one call per worker).
+SERVE_WORKERS = max(1, int(os.getenv("SERVE_WORKERS", "1")))
+# A worker's lease on a document it is extracting expires this long after its
+# last renewal, which happens every third of it; others wait until then
+DOCUMENT_LEASE_SECONDS = 60
+# Per-request profiling is only available when an admin token is configured.
+# Profiles are written to PROFILE_DIR if set, otherwise returned inline.
+PROFILE_ADMIN_TOKEN = os.getenv("PROFILE_ADMIN_TOKEN")
+PROFILE_DIR = os.getenv("PROFILE_DIR")
+# Optional persistent index of every extracted entity, searchable across
+# documents through /api/v1/entities/search
+ENTITY_INDEX_PATH = os.getenv("ENTITY_INDEX_PATH")
+# Optional on-disk cache of whole-document and per-paragraph results, shared
+# by every worker process when serving with src.serve
+RESULT_CACHE_PATH = os.getenv("RESULT_CACHE_PATH")
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "100000"))
+RESULT_CACHE_MAX_MB = int(os.getenv("RESULT_CACHE_MAX_MB", "256"))
 
-extractor = Extractor(GCP_MODEL_NAME, GCP_PROJECT_ID, GCP_LOCATION)
+result_cache = (
+    ResultCache(
+        RESULT_CACHE_PATH, RESULT_CACHE_MAX_ENTRIES, RESULT_CACHE_MAX_MB * 1024 * 1024
+    )
+    if RESULT_CACHE_PATH
+    else None
+)
+scheduler = ModelCallScheduler(
+    max_concurrent=max(1, MODEL_MAX_CONCURRENCY // SERVE_WORKERS),
+    client_quota=(
+        max(1, CLIENT_MAX_CONCURRENCY // SERVE_WORKERS)
+        if CLIENT_MAX_CONCURRENCY
+        else None
+    ),
+)
+if MODEL_MAX_CONCURRENCY < SERVE_WORKERS:
+    logger.warning(
+        f"MODEL_MAX_CONCURRENCY={MODEL_MAX_CONCURRENCY} is below the "
+        f"{SERVE_WORKERS} workers; allowing one model call per worker"
+    )
+extractor = Extractor(
+    GCP_MODEL_NAME, GCP_PROJECT_ID, GCP_LOCATION, scheduler, result_cache
+)
 logger.info("Model initialized")
 
+# Coalesces concurrent requests for the same PDF into one parse/extract run
+# within this process; the result cache's leases do so across workers
+inflight_requests = AsyncSingleFlight()
+
+entity_index = EntityIndex(ENTITY_INDEX_PATH) if ENTITY_INDEX_PATH else None
+
 app = FastAPI(
     title="Medical Entity Extraction API",
     description=(
@@ -30,21 +114,242 @@ app = FastAPI(
 )
 
 
+def request_key(content: bytes) -> str:
+    """Build the coalescing key for an upload.
+
+    Combines the PDF content hash with every option that changes the
+    extraction result, so only truly interchangeable requests are merged.
+
+    Args:
+        content (bytes): The raw PDF bytes
+
+    Returns:
+        str: Key identifying interchangeable requests
+    """
+    digest = hashlib.sha256(content).hexdigest()
+    return f"{digest}:{GCP_MODEL_NAME}:{PDF_LOW_MEMORY}:{PDF_MAX_MEMORY_MB}"
+
+
+def process_pdf(
+    content: bytes, filename: str, client_id: Optional[str] = None
+) -> EntityBatch:
+    """Parse a PDF and extract its medical entities.
+
+    Runs in a worker thread; concurrent duplicates are coalesced by the caller.
+
+    Args:
+        content (bytes): The raw PDF bytes
+        filename (str): Original filename, used for logging
+        client_id (Optional[str]): Identifies the caller for scheduling quotas
+
+    Returns:
+        EntityBatch: The extracted, validated entities
+
+    Raises:
+        HTTPException:
+            - 422: If PDF parsing fails
+            - 500: If entity extraction fails
+    """
+    # Process PDF file
+    try:
+        with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as temp:
+            logger.info(f"Writing file '{filename}' to temporary storage")
+            temp.write(content)
+            temp.flush()
+
+            logger.info("Parsing PDF content")
+            parser = PDFParser(
+                low_memory=PDF_LOW_MEMORY, max_memory_mb=PDF_MAX_MEMORY_MB
+            )
+            if PDF_LOW_MEMORY:
+                # Split each page as it is parsed instead of building the
+                # whole document's text first
+                pdf_text = None
+                paragraphs = extractor.split_pages_into_paragraphs(
+                    parser.iter_pages(temp.name)
+                )
+            else:
+                pdf_text = parser.parse_pdf(temp.name)
+                paragraphs = None
+
+            # Empty PDF or parsing/processing failed
+            if not (pdf_text or paragraphs):
+                raise HTTPException(
+                    status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                    detail=(
+                        "Unable to extract text from PDF. "
+                        "File may be empty or corrupted"
+                    ),
+                )
+    except Exception as e:
+        logger.error(f"PDF parsing error: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Failed to parse PDF content",
+        )
+    finally:
+        # Clean up temporary file
+        try:
+            os.unlink(temp.name)
+        except Exception as e:
+            logger.warning(f"Failed to delete temporary file: {e}")
+
+    # Extract entities from text
+    try:
+        logger.info("Extracting medical entities from text")
+        if paragraphs is not None:
+            entities = extractor.extract_paragraph_batch(paragraphs, client_id)
+        else:
+            entities = extractor.extract_entity_batch(pdf_text, client_id)
+
+        if entities:
+            logger.info(f"Successfully extracted {len(entities)} entities")
+        else:
+            logger.warning("No entities found in document")
+
+    except Exception as e:
+        logger.error(f"Entity extraction error: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to extract entities from document",
+        )
+
+    # Indexing is best effort; the caller still gets their entities. Empty
+    # results are indexed too, so re-extracting a document clears its old rows
+    if entity_index is not None:
+        try:
+            document_id = hashlib.sha256(content).hexdigest()
+            entity_index.add_document(document_id, entities, filename)
+        except Exception as e:
+            logger.error(f"Failed to index entities: {e}")
+
+    return entities
+
+
+def extract_json(
+    key: str, content: bytes, filename: str, client_id: Optional[str] = None
+) -> bytes:
+    """Return the serialized entities of a PDF, using the result cache.
+
+    With a result cache, the document is leased while it is extracted, so a
+    duplicate upload handled by another worker process waits for this result
+    instead of extracting it again.
+
+    Args:
+        key (str): The request key from request_key()
+        content (bytes): The raw PDF bytes
+        filename (str): Original filename, used for logging
+        client_id (Optional[str]): Identifies the caller for scheduling quotas
+
+    Returns:
+        bytes: The entities as a JSON array
+    """
+    if result_cache is None:
+        return process_pdf(content, filename, client_id).to_json_bytes()
+
+    cache_key = f"document:{key}"
+    while True:
+        cached = result_cache.get(cache_key)
+        if cached is not None:
+            logger.info(f"Serving cached result for '{filename}'")
+            return cached
+        token = result_cache.claim(cache_key, DOCUMENT_LEASE_SECONDS)
+        if token is not None:
+            break
+        logger.info(f"Waiting for another worker to extract '{filename}'")
+        result_cache.wait_for_release(cache_key)
+
+    with result_cache.hold(cache_key, token, DOCUMENT_LEASE_SECONDS):
+        entities = process_pdf(content, filename, client_id)
+        body = entities.to_json_bytes()
+        # Empty results may be model failures, so don't pin them
+        if entities:
+            result_cache.set(cache_key, body)
+        return body
+
+
+def profiling_authorized(admin_token: Optional[str]) -> bool:
+    """Check the admin token sent with a profiling request.
+
+    Args:
+        admin_token (Optional[str]): Value of the X-Admin-Token header
+
+    Returns:
+        bool: True if profiling is enabled and the token matches
+    """
+    if not PROFILE_ADMIN_TOKEN or not admin_token:
+        return False
+    return hmac.compare_digest(admin_token, PROFILE_ADMIN_TOKEN)
+
+
+async def profiled_response(
+    content: bytes, filename: str, client_id: Optional[str]
+) -> Response:
+    """Process a PDF under the profiler and attach the profile to the response.
+
+    Profiled requests skip request coalescing so the profile covers the full
+    parse, paragraph split and extraction run.
+
+    Args:
+        content (bytes): The raw PDF bytes
+        filename (str): Original filename, used for logging and report names
+        client_id (Optional[str]): Identifies the caller for scheduling quotas
+
+    Returns:
+        Response: The entities, with the report inline or its saved paths in
+            the X-Profile-Path header
+    """
+    logger.info(f"Profiling request for '{filename}'")
+    entities, report = await run_in_threadpool(
+        run_profiled, process_pdf, content, filename, client_id
+    )
+
+    if PROFILE_DIR:
+        digest = hashlib.sha256(content).hexdigest()[:12]
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}-{digest}"
+        paths = report.save(PROFILE_DIR, name)
+        return Response(
+            content=entities.to_json_bytes(),
+            media_type="application/json",
+            headers={"X-Profile-Path": paths["profile"]},
+        )
+
+    return JSONResponse(
+        content={
+            "entities": json.loads(entities.to_json_bytes()),
+            "profile": report.to_dict(),
+        }
+    )
+
+
 @app.post(
     "/api/v1/extract",
     response_model=List[Entity],
     responses={
         200: {"description": "Successfully extracted entities."},
         400: {"description": "Bad request, file not included or empty filename."},
+        403: {"description": "Profiling requested without a valid admin token."},
         415: {"description": "Unsupported file type."},
         500: {"description": "Server error."},
     },
 )
-async def extract_entities(file: UploadFile = File(...)) -> List[Entity]:
+async def extract_entities(
+    file: UploadFile = File(...),
+    x_client_id: Optional[str] = Header(None),
+    profile: bool = Query(False),
+    x_profile: bool = Header(False),
+    x_admin_token: Optional[str] = Header(None),
+) -> List[Entity]:
     """Extract medical entities from a PDF file.
 
     Args:
         file (UploadFile): The uploaded PDF file to process.
+        x_client_id (Optional[str]): Optional X-Client-ID header used to apply
+            per-client model call quotas.
+        profile (bool): Run the request under cProfile and tracemalloc.
+            Requires a valid X-Admin-Token header.
+        x_profile (bool): Header alternative to the profile query flag.
+        x_admin_token (Optional[str]): Admin token authorizing profiling.
 
     Returns:
         List[Entity]: A list of extracted medical entities with their
@@ -53,12 +358,19 @@ async def extract_entities(file: UploadFile = File(...)) -> List[Entity]:
     Raises:
         HTTPException:
             - 400: If file is missing or empty
+            - 403: If profiling is requested without a valid admin token
             - 413: If file size exceeds limit
             - 415: If file is not a PDF
             - 422: If PDF parsing fails
             - 500: For unexpected server errors
     """
     try:
+        if (profile or x_profile) and not profiling_authorized(x_admin_token):
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Profiling requires a valid admin token",
+            )
+
         # The file argument isn't optional, however FastAPI doesn't enforce it,
         # which I doubt...
         if not file:
@@ -96,57 +408,26 @@ async def extract_entities(file: UploadFile = File(...)) -> List[Entity]:
                 detail="Error reading file content",
             )
 
-        # Process PDF file
-        try:
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as temp:
-                logger.info(f"Writing file '{file.filename}' to temporary storage")
-                temp.write(content)
-                temp.flush()
-
-                logger.info("Parsing PDF content")
-                parser = PDFParser()
-                pdf_text = parser.parse_pdf(temp.name)
-
-                # Empty PDF or parsing/processing failed
-                if not pdf_text:
-                    raise HTTPException(
-                        status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
-                        detail=(
-                            "Unable to extract text from PDF. "
-                            "File may be empty or corrupted"
-                        ),
-                    )
-        except Exception as e:
-            logger.error(f"PDF parsing error: {e}")
-            raise HTTPException(
-                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
-                detail="Failed to parse PDF content",
-            )
-        finally:
-            # Clean up temporary file
-            try:
-                os.unlink(temp.name)
-            except Exception as e:
-                logger.warning(f"Failed to delete temporary file: {e}")
-
-        # Extract entities from text
-        try:
-            logger.info("Extracting medical entities from text")
-            entities = extractor.extract_entities(pdf_text)
-
-            if not entities:
-                logger.warning("No entities found in document")
-                return []
+        if profile or x_profile:
+            return await profiled_response(content, file.filename, x_client_id)
 
-            logger.info(f"Successfully extracted {len(entities)} entities")
-            return entities
-
-        except Exception as e:
-            logger.error(f"Entity extraction error: {e}")
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="Failed to extract entities from document",
-            )
+        # Identical uploads (client retries, several users sending the same
+        # paper) that arrive while one is still processing await its result
+        # without holding a threadpool thread each
+        key = request_key(content)
+        body = await inflight_requests.do(
+            key,
+            run_in_threadpool,
+            extract_json,
+            key,
+            content,
+            file.filename,
+            x_client_id,
+        )
+        # Entities were validated when the batch was built; returning the
+        # encoded bytes directly skips FastAPI re-validating every entity
+        # against response_model
+        return Response(content=body, media_type="application/json")
 
     except HTTPException as e:
         # Re-raise HTTP exceptions without modification
@@ -160,6 +441,88 @@ async def extract_entities(file: UploadFile = File(...)) -> List[Entity]:
         )
 
 
+@app.get(
+    "/api/v1/entities/search",
+    response_model=List[EntityMatch],
+    responses={
+        200: {"description": "Matching entity mentions."},
+        400: {"description": "Empty query or unknown search mode."},
+        404: {"description": "The entity index is not enabled."},
+    },
+)
+async def search_entities(
+    q: str = Query(..., description="Entity text to look up"),
+    mode: str = Query("exact", description="'exact' or 'prefix' match"),
+    limit: int = Query(100, ge=1, le=1000),
+    include_context: bool = Query(False),
+) -> List[EntityMatch]:
+    """Search previously extracted entities across all indexed documents.
+
+    Args:
+        q (str): Entity text; matched case-insensitively.
+        mode (str): "exact" or "prefix".
+        limit (int): Maximum number of mentions to return.
+        include_context (bool): Include the context paragraph text.
+
+    Returns:
+        List[EntityMatch]: Mentions with their document id, offsets and a
+            reference to their context.
+
+    Raises:
+        HTTPException:
+            - 400: If the query is empty or the mode is unknown
+            - 404: If the entity index is not enabled
+    """
+    if entity_index is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Entity index is not enabled",
+        )
+
+    try:
+        return await run_in_threadpool(
+            entity_index.search, q, mode, limit, include_context
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
+@app.get(
+    "/api/v1/entities/contexts/{context_id}",
+    response_model=EntityContext,
+    responses={
+        200: {"description": "The context paragraph."},
+        404: {"description": "Unknown context id or the index is not enabled."},
+    },
+)
+async def get_entity_context(context_id: int) -> EntityContext:
+    """Return the context paragraph referenced by a search result.
+
+    Args:
+        context_id (int): The context_id of an entity search result.
+
+    Returns:
+        EntityContext: The context paragraph text.
+
+    Raises:
+        HTTPException:
+            - 404: If the entity index is not enabled or the id is unknown
+    """
+    if entity_index is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Entity index is not enabled",
+        )
+
+    context = await run_in_threadpool(entity_index.get_context, context_id)
+    if context is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Context not found",
+        )
+    return EntityContext(context_id=context_id, context=context)
+
+
 @app.get("/health")
 async def health_check():
     """
@@ -0,0 +1,223 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+from loguru import logger
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from .models import EntityBatch
+from .result_cache import reconnect_after_fork
+
+logger = logger.bind(name="entity_index")
+
+SEARCH_MODES = ("exact", "prefix")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    id TEXT PRIMARY KEY,
+    filename TEXT,
+    indexed_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS contexts (
+    id INTEGER PRIMARY KEY,
+    document_id TEXT NOT NULL REFERENCES documents(id) ON DELETE CASCADE,
+    text TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS entities (
+    normalized TEXT NOT NULL,
+    entity TEXT NOT NULL,
+    document_id TEXT NOT NULL REFERENCES documents(id) ON DELETE CASCADE,
+    start INTEGER NOT NULL,
+    end INTEGER NOT NULL,
+    context_id INTEGER NOT NULL REFERENCES contexts(id) ON DELETE CASCADE
+);
+CREATE INDEX IF NOT EXISTS entities_normalized ON entities(normalized, document_id);
+CREATE INDEX IF NOT EXISTS entities_document ON entities(document_id);
+CREATE INDEX IF NOT EXISTS contexts_document ON contexts(document_id);
+"""
+
+
+def normalize_entity(text: str) -> str:
+    """Normalize entity text for lookups.
+
+    Case-folds and collapses whitespace so "CCR5", "ccr5" and " CCR5 " all
+    resolve to the same key.
+
+    Args:
+        text (str): The entity text
+
+    Returns:
+        str: The normalized key
+    """
+    return re.sub(r"\s+", " ", text).strip().casefold()
+
+
+class EntityIndex:
+    """Persistent inverted index of extracted entities across documents.
+
+    Backed by a single SQLite file with a B-tree index on the normalized
+    entity text, so exact and prefix lookups stay fast over millions of
+    entities without loading them into memory. The database runs in WAL mode,
+    so several worker processes can read it while one writes; each forked
+    worker reopens its own connection.
+    """
+
+    def __init__(self, path: Path | str) -> None:
+        """Open (creating if needed) the index at the given path.
+
+        Args:
+            path (Path | str): Path of the SQLite database file
+
+        Raises:
+            RuntimeError: If the database can't be opened or initialized
+        """
+        self.path = Path(path)
+        self._closed = False
+        self._connect()
+        logger.info(f"Opened entity index at {self.path}")
+        # A SQLite connection must not be shared with a forked child
+        os.register_at_fork(after_in_child=reconnect_after_fork(self))
+
+    def _connect(self) -> None:
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(
+                self.path, check_same_thread=False, isolation_level=None, timeout=30
+            )
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute("PRAGMA foreign_keys=ON")
+            self._conn.executescript(_SCHEMA)
+        except sqlite3.Error as e:
+            logger.error(f"Failed to open entity index at {self.path}: {e}")
+            raise RuntimeError(f"Entity index initialization failed: {str(e)}")
+        # sqlite3 connections aren't safe for concurrent use across threads
+        self._lock = threading.Lock()
+
+    def add_document(
+        self, document_id: str, entities: EntityBatch, filename: Optional[str] = None
+    ) -> int:
+        """Index a document's entities, replacing any earlier version of it.
+
+        Args:
+            document_id (str): Stable document identifier (the content hash)
+            entities (EntityBatch): The document's extracted entities
+            filename (Optional[str]): Original filename, for reference
+
+        Returns:
+            int: Number of entities indexed
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute("DELETE FROM documents WHERE id = ?", (document_id,))
+                self._conn.execute(
+                    "INSERT INTO documents (id, filename, indexed_at) VALUES (?, ?, ?)",
+                    (document_id, filename, time.time()),
+                )
+                context_ids = []
+                for context in entities.contexts:
+                    cursor = self._conn.execute(
+                        "INSERT INTO contexts (document_id, text) VALUES (?, ?)",
+                        (document_id, context),
+                    )
+                    context_ids.append(cursor.lastrowid)
+                self._conn.executemany(
+                    "INSERT INTO entities "
+                    "(normalized, entity, document_id, start, end, context_id) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (
+                        (
+                            normalize_entity(entity),
+                            entity,
+                            document_id,
+                            start,
+                            end,
+                            context_ids[context_id],
+                        )
+                        for entity, start, end, context_id in zip(
+                            entities.entities,
+                            entities.starts,
+                            entities.ends,
+                            entities.context_ids,
+                        )
+                    ),
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+        logger.info(f"Indexed {len(entities)} entities for document {document_id}")
+        return len(entities)
+
+    def search(
+        self,
+        query: str,
+        mode: str = "exact",
+        limit: int = 100,
+        include_context: bool = False,
+    ) -> List[Dict[str, Any]]:
+        """Find entity mentions by normalized text.
+
+        Args:
+            query (str): Entity text to look up
+            mode (str): "exact" for the whole normalized text, "prefix" for
+                entities starting with it
+            limit (int): Maximum number of mentions to return
+            include_context (bool): Include the context paragraph text, not
+                only its context_id
+
+        Returns:
+            List[Dict[str, Any]]: Matching mentions with entity, document_id,
+                start, end and context_id (plus context if requested)
+
+        Raises:
+            ValueError: If the query is empty or the mode is unknown
+        """
+        if mode not in SEARCH_MODES:
+            raise ValueError(f"mode must be one of {', '.join(SEARCH_MODES)}")
+        key = normalize_entity(query or "")
+        if not key:
+            raise ValueError("Query must be a non-empty string")
+
+        columns = "e.entity, e.document_id, e.start, e.end, e.context_id"
+        if include_context:
+            columns += ", c.text"
+        sql = f"SELECT {columns} FROM entities e"
+        if include_context:
+            sql += " JOIN contexts c ON c.id = e.context_id"
+
+        if mode == "exact":
+            sql += " WHERE e.normalized = ?"
+            params: tuple = (key,)
+        else:
+            # Range scan instead of LIKE, which SQLite can't serve from the
+            # index for arbitrary (case-folded, non-ASCII) prefixes
+            sql += " WHERE e.normalized >= ? AND e.normalized < ?"
+            params = (key, key[:-1] + chr(ord(key[-1]) + 1))
+        sql += " ORDER BY e.normalized, e.document_id, e.start LIMIT ?"
+
+        with self._lock:
+            rows = self._conn.execute(sql, params + (limit,)).fetchall()
+
+        fields = ["entity", "document_id", "start", "end", "context_id"]
+        if include_context:
+            fields.append("context")
+        return [dict(zip(fields, row)) for row in rows]
+
+    def get_context(self, context_id: int) -> Optional[str]:
+        """Return the context paragraph referenced by a search result."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT text FROM contexts WHERE id = ?", (context_id,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def close(self) -> None:
+        """Close the underlying database connection."""
+        with self._lock:
+            self._closed = True
+            self._conn.close()
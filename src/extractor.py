@@ -1,9 +1,17 @@
+import contextlib
+import copy
+import hashlib
 import json
 import re
 from loguru import logger
 import vertexai
 from vertexai.preview.generative_models import GenerativeModel
-from typing import List, Dict, Any, Optional
+from typing import Any, Dict, Iterable, List, Optional
+
+from .models import EntityBatch
+from .result_cache import ResultCache
+from .scheduler import DocumentJob, ModelCallScheduler, estimate_tokens
+from .single_flight import SingleFlight
 
 logger = logger.bind(name="extractor")
 
@@ -20,7 +28,12 @@ class Extractor:
     """
 
     def __init__(
-        self, GCP_MODEL_NAME: str, GCP_PROJECT_ID: str, GCP_LOCATION: str
+        self,
+        GCP_MODEL_NAME: str,
+        GCP_PROJECT_ID: str,
+        GCP_LOCATION: str,
+        scheduler: Optional[ModelCallScheduler] = None,
+        cache: Optional[ResultCache] = None,
     ) -> None:
         """Initialize the Extractor with GCP credentials and model.
 
@@ -28,6 +41,12 @@ class Extractor:
             gcp_model_name (str): Name of the Vertex AI model to use
             GCP_PROJECT_ID (str): GCP project identifier
             gcp_location (str): GCP region/location for the service
+            scheduler (Optional[ModelCallScheduler]): Shares model calls
+                fairly between concurrently processed documents. Without one,
+                every document calls the model as fast as it can.
+            cache (Optional[ResultCache]): Stores each paragraph's model
+                output so identical paragraphs skip the model call, across
+                requests and across worker processes.
 
         Raises:
             ValueError: If any of the GCP parameters are empty or invalid
@@ -42,6 +61,7 @@ class Extractor:
             vertexai.init(project=GCP_PROJECT_ID, location=GCP_LOCATION)
             # Initialize the generative model
             self.model = GenerativeModel(GCP_MODEL_NAME)
+            self.model_name = GCP_MODEL_NAME
             logger.info(f"Successfully initialized Vertex AI model: {GCP_MODEL_NAME}")
         except Exception as e:
             logger.error(f"Failed to initialize Vertex AI: {e}")
@@ -50,12 +70,21 @@ class Extractor:
         self.text: Optional[str] = None
         self.paragraphs: List[str] = []
         self.entities: List[Dict[str, Any]] = []
-
-    def extract_entities(self, text: str) -> List[Dict[str, Any]]:
+        # Identical paragraphs from concurrently processed documents share
+        # one model call instead of each paying for their own
+        self._inflight_paragraphs = SingleFlight()
+        self.scheduler = scheduler
+        self.cache = cache
+
+    def extract_entities(
+        self, text: str, client_id: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
         """Extracts entities from a text using the model.
 
         Args:
             text (str): The text to extract entities from.
+            client_id (Optional[str]): Identifies the caller for the
+                scheduler's per-client quota.
 
         Returns:
             List[Dict[str, Any]]: A list of dictionaries containing entities
@@ -76,19 +105,58 @@ class Extractor:
             raise ValueError("Input text must be a non-empty string")
 
         try:
-            # Store the input text
-            self.text = text
             # Split the text into manageable paragraphs as a list of strings
-            self.paragraphs = self.split_into_paragraphs(self.text)
+            paragraphs = self.split_into_paragraphs(text)
+        except Exception as e:
+            logger.error(f"Entity extraction failed: {e}")
+            raise RuntimeError(f"Entity extraction process failed: {str(e)}")
+
+        entities = self.extract_entities_from_paragraphs(paragraphs, client_id)
+        self.text = text
+        return entities
+
+    def extract_entities_from_paragraphs(
+        self, paragraphs: List[str], client_id: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """Extracts entities from text that has already been split.
+
+        Positions are relative to the paragraphs joined with newlines, the
+        same as for extract_entities() on the full text.
+
+        Args:
+            paragraphs (List[str]): The paragraphs to extract entities from,
+                e.g. from split_into_paragraphs() or
+                split_pages_into_paragraphs().
+            client_id (Optional[str]): Identifies the caller for the
+                scheduler's per-client quota.
+
+        Returns:
+            List[Dict[str, Any]]: A list of dictionaries containing entities
+            and their metadata, as for extract_entities().
+
+        Raises:
+            RuntimeError: If entity extraction process fails
+        """
+        try:
+            # Now that the document's size is known, let the scheduler rank it
+            job = (
+                self.scheduler.submit(paragraphs, client_id)
+                if self.scheduler and paragraphs
+                else None
+            )
             # Process text to extract entities and return them as
-            # a list of dictionaries
-            self.entities = self.process_text()
+            # a list of dictionaries. Paragraphs are passed explicitly so
+            # concurrent requests sharing this instance don't overwrite each
+            # other's paragraphs mid-way.
+            entities = self.process_text(paragraphs, job)
+            # Store the latest run for inspection
+            self.paragraphs, self.entities = paragraphs, entities
 
             # Handle JSON string response
-            if isinstance(self.entities, str):
+            if isinstance(entities, str):
                 try:
-                    logger.debug(f"Parsing JSON response: {self.entities}")
-                    return json.loads(self.entities)
+                    logger.debug(f"Parsing JSON response: {entities}")
+                    return json.loads(entities)
                 except json.JSONDecodeError as e:
                     # Just in-case, I think gemini is good at this
                     # The initial plan was to find/finetune a model for this
@@ -98,12 +166,75 @@ class Extractor:
                     logger.error(f"Failed to parse JSON response: {e}")
                     raise RuntimeError("Invalid JSON response from model")
 
-            return self.entities
+            return entities
 
         except Exception as e:
             logger.error(f"Entity extraction failed: {e}")
             raise RuntimeError(f"Entity extraction process failed: {str(e)}")
 
+    def extract_entity_batch(
+        self, text: str, client_id: Optional[str] = None
+    ) -> EntityBatch:
+        """Extracts entities from a text and validates them into a batch.
+
+        This is the validation boundary for the API: entities are checked
+        against the Entity schema once here, so the response can be
+        serialized directly without validating them again.
+
+        Args:
+            text (str): The text to extract entities from.
+            client_id (Optional[str]): Identifies the caller for the
+                scheduler's per-client quota.
+
+        Returns:
+            EntityBatch: The validated entities.
+
+        Raises:
+            ValueError: If input text is empty or invalid
+            RuntimeError: If entity extraction process fails
+        """
+        return EntityBatch.from_dicts(self.extract_entities(text, client_id))
+
+    def extract_paragraph_batch(
+        self, paragraphs: List[str], client_id: Optional[str] = None
+    ) -> EntityBatch:
+        """Extracts entities from split paragraphs and validates them into a batch.
+
+        Args:
+            paragraphs (List[str]): The paragraphs to extract entities from.
+            client_id (Optional[str]): Identifies the caller for the
+                scheduler's per-client quota.
+
+        Returns:
+            EntityBatch: The validated entities.
+
+        Raises:
+            RuntimeError: If entity extraction process fails
+        """
+        return EntityBatch.from_dicts(
+            self.extract_entities_from_paragraphs(paragraphs, client_id)
+        )
+
+    def split_pages_into_paragraphs(self, pages: Iterable[str]) -> List[str]:
+        """Splits text arriving page by page into paragraphs.
+
+        Each page is split as soon as it arrives, so the document's text is
+        never held as one string. Gives the same paragraphs as
+        split_into_paragraphs() on the pages joined with newlines.
+
+        Args:
+            pages (Iterable[str]): Page texts, e.g. from PDFParser.iter_pages()
+
+        Returns:
+            List[str]: A list of cleaned paragraphs
+        """
+        paragraphs: List[str] = []
+        for page in pages:
+            paragraphs.extend(p.strip() for p in re.split(r"\n+", page) if p.strip())
+
+        logger.info(f"Successfully split pages into {len(paragraphs)} paragraphs")
+        return paragraphs
+
     def split_into_paragraphs(self, text: str) -> List[str]:
         """Splits the input text into paragraphs based on newline characters.
 
@@ -237,10 +368,23 @@ class Extractor:
             logger.error(f"Unexpected error during entity extraction: {e}")
             return []
 
-    def process_text(self) -> List[Dict[str, Any]]:
+    def process_text(
+        self,
+        paragraphs: Optional[List[str]] = None,
+        job: Optional[DocumentJob] = None,
+    ) -> List[Dict[str, Any]]:
         """Processes the entire text, splitting it into paragraphs and extracting
         entities from each.
 
+        Concurrent calls that hit an identical paragraph at the same time share
+        a single model call.
+
+        Args:
+            paragraphs (Optional[List[str]]): Paragraphs to process. Defaults
+                to self.paragraphs.
+            job (Optional[DocumentJob]): The document's scheduler handle, if
+                model calls go through the scheduler.
+
         Returns:
             List[Dict[str, Any]]: A list of dictionaries containing extracted entities
             and their metadata.
@@ -251,11 +395,14 @@ class Extractor:
                 - end (int): Character position where entity ends in the full text
 
         Raises:
-            ValueError: If self.paragraphs is None or empty
+            ValueError: If the paragraphs are None or empty
             TypeError: If entity positions are not valid integers
         """
+        if paragraphs is None:
+            paragraphs = self.paragraphs
+
         # Validate that we have paragraphs to process
-        if not self.paragraphs:
+        if not paragraphs:
             logger.error("No paragraphs found to process")
             raise ValueError(
                 "Text must be initialized and split into paragraphs before processing"
@@ -267,8 +414,8 @@ class Extractor:
 
         try:
             # Process each paragraph sequentially
-            for i, paragraph in enumerate(self.paragraphs):
-                logger.debug(f"Processing paragraph {i+1}/{len(self.paragraphs)}")
+            for i, paragraph in enumerate(paragraphs):
+                logger.debug(f"Processing paragraph {i+1}/{len(paragraphs)}")
 
                 # Ensure paragraph is a valid string
                 if not isinstance(paragraph, str):
@@ -277,8 +424,21 @@ class Extractor:
                     )
                     continue
 
-                # Extract entities from current paragraph
-                paragraph_entities = self.extract_entities_from_paragraph(paragraph)
+                # Extract entities from current paragraph. The result may be
+                # shared with other callers, so copy it before adjusting. While
+                # waiting, this document's priority counts for the shared call.
+                with (
+                    self.scheduler.sharing(paragraph, job)
+                    if job is not None
+                    else contextlib.nullcontext()
+                ):
+                    paragraph_entities = copy.deepcopy(
+                        self._inflight_paragraphs.do(
+                            paragraph, self._call_model, paragraph, job
+                        )
+                    )
+                if job is not None:
+                    self.scheduler.advance(job, estimate_tokens(paragraph))
 
                 # Adjust entity positions to be relative to the full text
                 for entity in paragraph_entities:
@@ -314,10 +474,45 @@ class Extractor:
 
             logger.info(
                 f"Successfully processed {len(all_entities)} entities"
-                f" from {len(self.paragraphs)} paragraphs"
+                f" from {len(paragraphs)} paragraphs"
             )
             return all_entities
 
         except Exception as e:
             logger.error(f"Unexpected error during text processing: {e}")
             raise  # Re-raise the exception after logging
+
+    def _call_model(
+        self, paragraph: str, job: Optional[DocumentJob]
+    ) -> List[Dict[str, Any]]:
+        """Extract entities from a paragraph, waiting for a scheduler slot first.
+
+        Cached results are returned without taking a scheduler slot.
+
+        Args:
+            paragraph (str): The paragraph to extract entities from.
+            job (Optional[DocumentJob]): The document's scheduler handle.
+
+        Returns:
+            List[Dict[str, Any]]: The entities extracted from the paragraph.
+        """
+        cache_key = None
+        if self.cache is not None:
+            digest = hashlib.sha256(paragraph.encode("utf-8")).hexdigest()
+            cache_key = f"paragraph:{self.model_name}:{digest}"
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return json.loads(cached)
+
+        if self.scheduler is None or job is None:
+            entities = self.extract_entities_from_paragraph(paragraph)
+        else:
+            # Keyed by paragraph so documents waiting on this call lend it
+            # their priority
+            with self.scheduler.slot(job, key=paragraph):
+                entities = self.extract_entities_from_paragraph(paragraph)
+
+        # Empty results may be model or parsing failures, so don't pin them
+        if cache_key is not None and entities:
+            self.cache.set(cache_key, json.dumps(entities).encode("utf-8"))
+        return entities
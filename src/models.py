@@ -1,4 +1,18 @@
-from pydantic import BaseModel, Field
+from array import array
+from dataclasses import dataclass, field
+from loguru import logger
+import orjson
+from pydantic import BaseModel, Field, ValidationError
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+logger = logger.bind(name="models")
+
+_INT64_MIN, _INT64_MAX = -(2**63), 2**63 - 1
+
+
+def _encode_str(value: str) -> bytes:
+    """JSON-encode a single string."""
+    return orjson.dumps(value)
 
 
 class Entity(BaseModel):
@@ -10,3 +24,129 @@ class Entity(BaseModel):
     context: str = Field(..., description="The context of the entity")
     start: int = Field(..., description="The start index of the entity in the text")
     end: int = Field(..., description="The end index of the entity in the text")
+
+
+class EntityMatch(BaseModel):
+    """
+    Represents a mention of an entity found in the cross-document index.
+    """
+
+    entity: str = Field(..., description="The entity as extracted")
+    document_id: str = Field(..., description="SHA-256 of the source PDF")
+    start: int = Field(..., description="The start index of the entity in the text")
+    end: int = Field(..., description="The end index of the entity in the text")
+    context_id: int = Field(
+        ...,
+        description=(
+            "Reference to the entity's context, resolved by "
+            "/api/v1/entities/contexts/{context_id}"
+        ),
+    )
+    context: Optional[str] = Field(
+        None, description="The context of the entity, if requested"
+    )
+
+
+class EntityContext(BaseModel):
+    """
+    Represents a context paragraph stored in the cross-document index.
+    """
+
+    context_id: int = Field(..., description="The context's id in the index")
+    context: str = Field(..., description="The context paragraph text")
+
+
+@dataclass
+class EntityBatch:
+    """Compact, already validated collection of extracted entities.
+
+    Stores entities column-wise. Every entity from the same paragraph shares
+    that paragraph as its context, so contexts are stored (and JSON-encoded)
+    once and referenced by index. Build it with from_dicts() at the extractor
+    boundary and serialize it with to_json_bytes(), which skips the per-entity
+    Pydantic validation FastAPI would otherwise do for response_model.
+    """
+
+    entities: List[str] = field(default_factory=list)
+    starts: array = field(default_factory=lambda: array("q"))
+    ends: array = field(default_factory=lambda: array("q"))
+    context_ids: array = field(default_factory=lambda: array("L"))
+    contexts: List[str] = field(default_factory=list)
+
+    @classmethod
+    def from_dicts(cls, items: Iterable[Dict[str, Any]]) -> "EntityBatch":
+        """Validate extractor output and pack it into a batch.
+
+        Each entry is validated with the Entity model, so the rules match the
+        response_model exactly. Entries that fail validation, or whose
+        offsets don't fit in 64 bits, are skipped with a warning.
+
+        Args:
+            items (Iterable[Dict[str, Any]]): Entities as returned by
+                Extractor.extract_entities
+
+        Returns:
+            EntityBatch: The validated entities
+        """
+        batch = cls()
+        context_index: Dict[str, int] = {}
+        skipped = 0
+
+        for item in items:
+            try:
+                validated = Entity.model_validate(item)
+            except ValidationError as e:
+                logger.debug(f"Skipping invalid entity {item!r}: {e}")
+                skipped += 1
+                continue
+            # Offsets are stored as signed 64-bit integers
+            if not all(
+                _INT64_MIN <= v <= _INT64_MAX for v in (validated.start, validated.end)
+            ):
+                logger.debug(f"Skipping entity with out of range offsets {item!r}")
+                skipped += 1
+                continue
+            entity, context = validated.entity, validated.context
+            start, end = validated.start, validated.end
+
+            context_id = context_index.get(context)
+            if context_id is None:
+                context_id = context_index[context] = len(batch.contexts)
+                batch.contexts.append(context)
+
+            batch.entities.append(entity)
+            batch.starts.append(start)
+            batch.ends.append(end)
+            batch.context_ids.append(context_id)
+
+        if skipped:
+            logger.warning(f"Skipped {skipped} entities that failed validation")
+        return batch
+
+    def __len__(self) -> int:
+        return len(self.entities)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for i, entity in enumerate(self.entities):
+            yield {
+                "entity": entity,
+                "context": self.contexts[self.context_ids[i]],
+                "start": self.starts[i],
+                "end": self.ends[i],
+            }
+
+    def to_json_bytes(self) -> bytes:
+        """Serialize the batch as a JSON array matching List[Entity].
+
+        Returns:
+            bytes: UTF-8 encoded JSON
+        """
+        encoded_contexts = [_encode_str(context) for context in self.contexts]
+        parts = [
+            b'{"entity":%s,"context":%s,"start":%d,"end":%d}'
+            % (_encode_str(entity), encoded_contexts[context_id], start, end)
+            for entity, context_id, start, end in zip(
+                self.entities, self.context_ids, self.starts, self.ends
+            )
+        ]
+        return b"[" + b",".join(parts) + b"]"
@@ -1,14 +1,63 @@
+import os
+import resource
+import sys
+import threading
 import pdfplumber
 from loguru import logger
-from typing import List, Optional
+from typing import Iterator, List, Optional
 from pathlib import Path
 
 logger = logger.bind(name="pdf_parser")
 
+# The memory ceiling is measured as process-wide RSS growth, so two parses
+# running at once would count against each other's limit. Parses that enforce
+# a ceiling take turns; parsing holds the GIL anyway, so concurrent parses in
+# one process gain little (use src.serve workers for parallelism).
+_measured_parse_lock = threading.Lock()
+
+
+def _current_rss_bytes() -> int:
+    """Return the resident set size of the current process in bytes.
+
+    Reads ``/proc/self/statm`` where available (Linux, which is what we run on
+    in Cloud Run) and falls back to the peak RSS reported by ``getrusage``.
+    """
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in bytes on macOS and kilobytes everywhere else
+        return peak if sys.platform == "darwin" else peak * 1024
+
 
 class PDFParser:
-    def __init__(self) -> None:
+    def __init__(
+        self, low_memory: bool = False, max_memory_mb: Optional[int] = None
+    ) -> None:
+        """Initialize the parser.
+
+        Args:
+            low_memory (bool): Release each page's caches and layout objects as
+                soon as its text is extracted. Combine with iter_pages() to
+                consume text page by page instead of as one string.
+            max_memory_mb (Optional[int]): Per-document memory ceiling in MB,
+                measured as RSS growth since parsing started. ``None``
+                disables the check. Parses with a ceiling are serialized
+                within the process so they don't count each other's memory.
+
+        Raises:
+            ValueError: If max_memory_mb is not a positive number
+        """
+        if max_memory_mb is not None and max_memory_mb <= 0:
+            raise ValueError("max_memory_mb must be a positive number")
+
         self.last_parsed = None
+        self.low_memory = low_memory
+        self.max_memory_mb = max_memory_mb
+        # RSS growth (bytes) observed while parsing the last document, useful
+        # for tuning max_memory_mb
+        self.peak_memory_delta: int = 0
 
     def parse_pdf(self, file_path: Path | str) -> str:
         """Parse a PDF file and extract its text content.
@@ -26,51 +75,117 @@ class PDFParser:
         Raises:
             PermissionError: If the PDF file can't be accessed.
             ValueError: If the file path is invalid or file is not a PDF.
-            RuntimeError: If PDF parsing fails for any other reason.
+            RuntimeError: If PDF parsing fails for any other reason, including
+                exceeding the configured memory ceiling.
         """
         self.last_parsed = file_path
 
         try:
             return self._extract_text(file_path)
-        except FileNotFoundError as e:
-            logger.error(f"PDF file not found: {e}")
-            raise ValueError(f"PDF file not found: {str(e)}")
-        except pdfplumber.pdfminer.pdfparser.PDFSyntaxError as e:
-            logger.error(f"Invalid or corrupted PDF file: {e}")
-            raise ValueError(f"Invalid or corrupted PDF file: {str(e)}")
         except Exception as e:
-            logger.error(f"Unexpected error parsing PDF: {e}")
-            raise RuntimeError(f"Failed to parse PDF: {str(e)}")
+            raise self._translate_error(e)
 
-    def _extract_text(self, file_path: Path) -> str:
-        """Extract text from PDF file page by page.
+    def iter_pages(self, file_path: Path | str) -> Iterator[str]:
+        """Yield the text of each page as soon as it is extracted.
+
+        Unlike parse_pdf(), the document's text is never held as one string,
+        so callers can process it page by page. In low-memory mode each
+        page's cached layout objects are released before the next page is
+        processed, keeping memory roughly constant regardless of page count.
+        Pages without text are skipped.
 
         Args:
-            file_path (Path): Path to the PDF file
+            file_path (Path | str): Path to the PDF file
 
-        Returns:
-            str: Extracted text from all pages
+        Yields:
+            str: Extracted text of a single page
+
+        Raises:
+            ValueError: If the file path is invalid or file is not a PDF.
+            RuntimeError: If PDF parsing fails for any other reason, including
+                exceeding the configured memory ceiling.
+        """
+        self.last_parsed = file_path
+
+        try:
+            yield from self._iter_pages(file_path)
+        except Exception as e:
+            raise self._translate_error(e)
+
+    def _translate_error(self, error: Exception) -> Exception:
+        """Map a parsing failure to the exception parse_pdf documents."""
+        if isinstance(error, FileNotFoundError):
+            logger.error(f"PDF file not found: {error}")
+            return ValueError(f"PDF file not found: {str(error)}")
+        if isinstance(error, pdfplumber.pdfminer.pdfparser.PDFSyntaxError):
+            logger.error(f"Invalid or corrupted PDF file: {error}")
+            return ValueError(f"Invalid or corrupted PDF file: {str(error)}")
+        if isinstance(error, MemoryError):
+            logger.error(f"Memory limit exceeded parsing PDF: {error}")
+            return RuntimeError(f"Memory limit exceeded parsing PDF: {str(error)}")
+        logger.error(f"Unexpected error parsing PDF: {error}")
+        return RuntimeError(f"Failed to parse PDF: {str(error)}")
+
+    def _iter_pages(self, file_path: Path | str) -> Iterator[str]:
+        """Extract text page by page, enforcing the memory ceiling.
+
+        Raises:
+            MemoryError: If RSS growth exceeds max_memory_mb
         """
-        all_text: List[str] = []
+        if self.max_memory_mb is None:
+            yield from self._iter_pages_unlocked(file_path)
+            return
+
+        with _measured_parse_lock:
+            yield from self._iter_pages_unlocked(file_path)
+
+    def _iter_pages_unlocked(self, file_path: Path | str) -> Iterator[str]:
+        baseline = _current_rss_bytes()
+        self.peak_memory_delta = 0
+        limit = self.max_memory_mb * 1024 * 1024 if self.max_memory_mb else None
 
         with pdfplumber.open(file_path) as pdf:
             if not pdf.pages:
                 logger.warning(f"PDF file contains no pages: {file_path}")
-                return ""
+                return
 
+            page_count = len(pdf.pages)
             for page_num, page in enumerate(pdf.pages, 1):
                 try:
-                    logger.debug(f"Processing page {page_num}/{len(pdf.pages)}")
+                    logger.debug(f"Processing page {page_num}/{page_count}")
                     text: Optional[str] = page.extract_text()
-
-                    if text:
-                        all_text.append(text)
-                    else:
-                        logger.warning(f"No text extracted from page {page_num}")
-
                 except Exception as e:
                     logger.error(f"Error processing page {page_num}: {e}")
-                    continue
+                    text = None
+                finally:
+                    if self.low_memory:
+                        # Drops the page's parsed objects, layout and textmap
+                        # caches
+                        page.close()
+
+                delta = _current_rss_bytes() - baseline
+                self.peak_memory_delta = max(self.peak_memory_delta, delta)
+                if limit is not None and delta > limit:
+                    raise MemoryError(
+                        f"Parsing used {delta // (1024 * 1024)}MB at page "
+                        f"{page_num}, exceeding the {self.max_memory_mb}MB limit"
+                    )
+
+                if text:
+                    yield text
+                else:
+                    logger.warning(f"No text extracted from page {page_num}")
+
+    def _extract_text(self, file_path: Path) -> str:
+        """Extract text from PDF file page by page.
+
+        Args:
+            file_path (Path): Path to the PDF file
+
+        Returns:
+            str: Extracted text from all pages
+        """
+        all_text: List[str] = list(self._iter_pages(file_path))
 
         if not all_text:
             logger.warning("No text could be extracted from any page")
@@ -79,6 +194,7 @@ class PDFParser:
         result = "\n".join(all_text)
         logger.info(
             f"Successfully extracted {len(result)} characters "
-            f"from {len(pdf.pages)} pages"
+            f"from {len(all_text)} pages "
+            f"(peak memory growth {self.peak_memory_delta // 1024}KB)"
         )
         return result
@@ -0,0 +1,308 @@
+import os
+import sqlite3
+import threading
+import time
+import uuid
+import weakref
+from contextlib import contextmanager
+from loguru import logger
+from pathlib import Path
+from typing import Callable, Iterator, Optional
+
+logger = logger.bind(name="result_cache")
+
+
+class ResultCache:
+    """Local on-disk cache shared by every worker process on the instance.
+
+    Values are opaque bytes stored in a SQLite file in WAL mode, so any number
+    of worker processes can read it concurrently while one writes, and a
+    result computed by one worker is a cache hit for all the others. The
+    oldest entries are evicted once max_entries or max_bytes is exceeded.
+
+    Workers can also lease a key while computing its value, so duplicates
+    arriving at other workers wait for that result instead of repeating the
+    work. Leases are short and renewed while the work runs, so a crashed
+    worker's lease soon expires but a slow one keeps its lease.
+    """
+
+    def __init__(
+        self,
+        path: Path | str,
+        max_entries: int = 100_000,
+        max_bytes: int = 256 * 1024 * 1024,
+    ) -> None:
+        """Open (creating if needed) the cache at the given path.
+
+        Args:
+            path (Path | str): Path of the SQLite database file
+            max_entries (int): Number of entries kept before evicting the oldest
+            max_bytes (int): Total size of the stored values kept before
+                evicting the oldest. Limits are checked periodically, so each
+                process may overshoot by about a tenth of this between checks.
+                Deleted space is reused rather than returned, so the file
+                stays at its largest size.
+
+        Raises:
+            ValueError: If max_entries or max_bytes is not positive
+            RuntimeError: If the database can't be opened or initialized
+        """
+        if max_entries <= 0:
+            raise ValueError("max_entries must be a positive number")
+        if max_bytes <= 0:
+            raise ValueError("max_bytes must be a positive number")
+
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._writes = 0
+        # Bytes written by this process since the limits were last checked
+        self._unchecked_bytes = 0
+        self._closed = False
+        self._connect()
+        # A SQLite connection must not be shared with a forked child
+        os.register_at_fork(after_in_child=reconnect_after_fork(self))
+
+    def _connect(self) -> None:
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(
+                self.path, check_same_thread=False, isolation_level=None, timeout=30
+            )
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                "key TEXT PRIMARY KEY, value BLOB NOT NULL, created_at REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS results_created ON results(created_at)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS leases ("
+                "key TEXT PRIMARY KEY, owner TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+        except sqlite3.Error as e:
+            logger.error(f"Failed to open result cache at {self.path}: {e}")
+            raise RuntimeError(f"Result cache initialization failed: {str(e)}")
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Return the cached value for key, or None on a miss.
+
+        Cache errors are logged and treated as misses.
+        """
+        try:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT value FROM results WHERE key = ?", (key,)
+                ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"Result cache read failed: {e}")
+            return None
+        return row[0] if row else None
+
+    def set(self, key: str, value: bytes) -> None:
+        """Store value under key, evicting the oldest entries if over capacity.
+
+        Cache errors are logged and otherwise ignored.
+        """
+        try:
+            with self._lock:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO results (key, value, created_at) "
+                    "VALUES (?, ?, ?)",
+                    (key, value, time.time()),
+                )
+                self._writes += 1
+                self._unchecked_bytes += len(value)
+                # Checking the size on every write would double write cost, but
+                # a few large documents mustn't overshoot the byte limit either
+                if (
+                    self._writes % 100 == 0
+                    or self._unchecked_bytes >= self.max_bytes // 10
+                ):
+                    self._evict()
+        except sqlite3.Error as e:
+            logger.warning(f"Result cache write failed: {e}")
+
+    def claim(self, key: str, ttl: float) -> Optional[str]:
+        """Lease key to this caller unless another unexpired lease holds it.
+
+        The lease expires after ttl seconds unless renewed, so a crashed
+        worker can't block the key for long; use hold() to keep it while
+        computing the value. Cache errors are logged and grant the lease, so
+        callers fall back to doing the work themselves.
+
+        Args:
+            key (str): The key about to be computed
+            ttl (float): Seconds before the lease expires
+
+        Returns:
+            Optional[str]: Token identifying the lease if the caller now holds
+                it, otherwise None
+        """
+        token = uuid.uuid4().hex
+        now = time.time()
+        try:
+            with self._lock:
+                # Takes over the row only if its lease has expired
+                cursor = self._conn.execute(
+                    "INSERT INTO leases (key, owner, expires_at) VALUES (?, ?, ?) "
+                    "ON CONFLICT(key) DO UPDATE SET "
+                    "owner = excluded.owner, expires_at = excluded.expires_at "
+                    "WHERE leases.expires_at <= ?",
+                    (key, token, now + ttl, now),
+                )
+        except sqlite3.Error as e:
+            logger.warning(f"Result cache lease failed: {e}")
+            return token
+        return token if cursor.rowcount == 1 else None
+
+    def renew(self, key: str, token: str, ttl: float) -> bool:
+        """Extend the caller's lease on key by ttl seconds from now.
+
+        Args:
+            key (str): The leased key
+            token (str): The token claim() returned
+            ttl (float): Seconds before the lease expires
+
+        Returns:
+            bool: False if the lease is no longer held by this token, or
+                couldn't be renewed
+        """
+        try:
+            with self._lock:
+                cursor = self._conn.execute(
+                    "UPDATE leases SET expires_at = ? WHERE key = ? AND owner = ?",
+                    (time.time() + ttl, key, token),
+                )
+        except sqlite3.Error as e:
+            logger.warning(f"Result cache lease renewal failed: {e}")
+            return False
+        return cursor.rowcount == 1
+
+    def release(self, key: str, token: str) -> None:
+        """Drop the caller's lease on key, leaving anyone else's lease alone.
+
+        Cache errors are logged and otherwise ignored.
+        """
+        try:
+            with self._lock:
+                self._conn.execute(
+                    "DELETE FROM leases WHERE key = ? AND owner = ?", (key, token)
+                )
+        except sqlite3.Error as e:
+            logger.warning(f"Result cache lease release failed: {e}")
+
+    @contextmanager
+    def hold(self, key: str, token: str, ttl: float) -> Iterator[None]:
+        """Renew the caller's lease on key while inside, then release it.
+
+        A background thread renews the lease every ttl / 3 seconds, so work
+        that outlasts ttl keeps the lease.
+
+        Args:
+            key (str): The leased key
+            token (str): The token claim() returned
+            ttl (float): Seconds the lease lasts without a renewal
+        """
+        stop = threading.Event()
+
+        def heartbeat() -> None:
+            while not stop.wait(ttl / 3):
+                if not self.renew(key, token, ttl):
+                    logger.warning(f"Lost the result cache lease on {key}")
+                    return
+
+        renewer = threading.Thread(target=heartbeat, name="lease-heartbeat")
+        renewer.daemon = True
+        renewer.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            renewer.join()
+            self.release(key, token)
+
+    def wait_for_release(self, key: str, poll_interval: float = 0.1) -> None:
+        """Block until nobody holds an unexpired lease on key.
+
+        Cache errors are logged and end the wait.
+        """
+        while True:
+            try:
+                with self._lock:
+                    row = self._conn.execute(
+                        "SELECT 1 FROM leases WHERE key = ? AND expires_at > ?",
+                        (key, time.time()),
+                    ).fetchone()
+            except sqlite3.Error as e:
+                logger.warning(f"Result cache lease check failed: {e}")
+                return
+            if row is None:
+                return
+            time.sleep(poll_interval)
+
+    def _evict(self) -> None:
+        """Delete the oldest entries beyond max_entries and max_bytes.
+
+        Caller holds the lock.
+        """
+        self._unchecked_bytes = 0
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM results").fetchone()
+        excess = count - self.max_entries
+        if excess > 0:
+            self._conn.execute(
+                "DELETE FROM results WHERE key IN ("
+                "SELECT key FROM results ORDER BY created_at LIMIT ?)",
+                (excess,),
+            )
+            logger.debug(f"Evicted {excess} cache entries")
+
+        # Keep the newest entries that fit in max_bytes. length() of a BLOB is
+        # read from the record header, so this doesn't load the values.
+        evicted = self._conn.execute(
+            "DELETE FROM results WHERE key IN ("
+            "SELECT key FROM ("
+            "SELECT key, SUM(length(value)) OVER ("
+            "ORDER BY created_at DESC, key ROWS UNBOUNDED PRECEDING) AS kept "
+            "FROM results) WHERE kept > ?)",
+            (self.max_bytes,),
+        ).rowcount
+        if evicted > 0:
+            logger.debug(f"Evicted {evicted} cache entries over the byte limit")
+
+    def size_bytes(self) -> int:
+        """Return the total size of the stored values in bytes."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COALESCE(SUM(length(value)), 0) FROM results"
+            ).fetchone()[0]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    def close(self) -> None:
+        """Close the underlying database connection."""
+        with self._lock:
+            self._closed = True
+            self._conn.close()
+
+
+def reconnect_after_fork(store) -> Callable[[], None]:
+    """Build a fork hook that gives the child its own SQLite connection.
+
+    Only a weak reference is kept so the hook doesn't keep the store alive.
+    Works for any object with _connect() and _closed, such as ResultCache and
+    EntityIndex.
+    """
+    ref = weakref.ref(store)
+
+    def reconnect() -> None:
+        instance = ref()
+        if instance is not None and not instance._closed:
+            instance._connect()
+
+    return reconnect
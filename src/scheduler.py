@@ -0,0 +1,234 @@
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from loguru import logger
+from typing import Dict, Hashable, Iterator, List, Optional, Sequence
+
+logger = logger.bind(name="scheduler")
+
+# Rough size of the extraction prompt wrapped around every paragraph
+PROMPT_OVERHEAD_TOKENS = 200
+
+
+def estimate_tokens(paragraph: str) -> int:
+    """Estimate the model tokens needed to process one paragraph.
+
+    Uses the usual ~4 characters per token rule of thumb plus the fixed prompt
+    template; good enough to rank documents against each other.
+
+    Args:
+        paragraph (str): The paragraph that will be sent to the model
+
+    Returns:
+        int: Estimated token count
+    """
+    return len(paragraph) // 4 + PROMPT_OVERHEAD_TOKENS
+
+
+@dataclass
+class DocumentJob:
+    """Tracks the remaining estimated cost of one document being extracted."""
+
+    client_id: Optional[str]
+    chunks: int
+    remaining_tokens: int
+    submitted: float = field(default_factory=time.monotonic)
+
+
+@dataclass
+class _Ticket:
+    job: DocumentJob
+    seq: int
+    key: Optional[Hashable] = None
+    enqueued: float = field(default_factory=time.monotonic)
+
+
+class ModelCallScheduler:
+    """Shares a fixed number of concurrent model calls fairly between documents.
+
+    Every document registers its estimated cost after parsing. When a model
+    call slot frees up it goes to the waiting chunk whose document has the
+    fewest remaining tokens (shortest remaining job first), so a short
+    abstract does not queue behind hundreds of chunks of a thesis. Each
+    waiting chunk's priority improves with the time it has waited, so large
+    documents still make progress under a steady stream of small ones. An
+    optional per-client quota caps how many slots a single client may hold.
+
+    A model call shared by several documents (an identical paragraph such as
+    a common heading) is ranked by the most urgent document waiting on it,
+    so a small document isn't held back by a large one it shares a line with.
+    """
+
+    def __init__(
+        self,
+        max_concurrent: int = 4,
+        client_quota: Optional[int] = None,
+        aging_tokens_per_second: float = 1000.0,
+    ) -> None:
+        """Initialize the scheduler.
+
+        Args:
+            max_concurrent (int): Maximum number of model calls in flight
+            client_quota (Optional[int]): Maximum model calls in flight per
+                client. None means unlimited. Calls without a client id are
+                only bound by max_concurrent.
+            aging_tokens_per_second (float): How many tokens of priority a
+                waiting chunk gains per second waited
+
+        Raises:
+            ValueError: If max_concurrent or client_quota is not positive
+        """
+        if max_concurrent <= 0:
+            raise ValueError("max_concurrent must be a positive number")
+        if client_quota is not None and client_quota <= 0:
+            raise ValueError("client_quota must be a positive number")
+
+        self.max_concurrent = max_concurrent
+        self.client_quota = client_quota
+        self.aging_tokens_per_second = aging_tokens_per_second
+
+        self._cond = threading.Condition()
+        self._seq = itertools.count()
+        self._waiting: List[_Ticket] = []
+        self._running = 0
+        self._running_per_client: Dict[Optional[str], int] = {}
+        # Documents waiting on the shared call with each key, see sharing()
+        self._sharing: Dict[Hashable, List[DocumentJob]] = {}
+
+    def submit(
+        self, paragraphs: Sequence[str], client_id: Optional[str] = None
+    ) -> DocumentJob:
+        """Register a parsed document and its estimated cost.
+
+        Args:
+            paragraphs (Sequence[str]): The chunks that will be sent to the model
+            client_id (Optional[str]): Identifies the caller for quotas
+
+        Returns:
+            DocumentJob: Handle to pass to slot() for each model call
+        """
+        job = DocumentJob(
+            client_id=client_id,
+            chunks=len(paragraphs),
+            remaining_tokens=sum(
+                estimate_tokens(p) for p in paragraphs if isinstance(p, str)
+            ),
+        )
+        logger.debug(
+            f"Scheduled document with {job.chunks} chunks, "
+            f"~{job.remaining_tokens} tokens (client={client_id})"
+        )
+        return job
+
+    @contextmanager
+    def slot(self, job: DocumentJob, key: Optional[Hashable] = None) -> Iterator[None]:
+        """Hold one model call slot for a chunk of the given document.
+
+        Blocks until the scheduler picks this chunk.
+
+        Args:
+            job (DocumentJob): The document the chunk belongs to
+            key (Optional[Hashable]): Identifies a call other documents may
+                be waiting on, see sharing()
+        """
+        self._acquire(job, key)
+        try:
+            yield
+        finally:
+            self._release(job)
+
+    @contextmanager
+    def sharing(self, key: Hashable, job: DocumentJob) -> Iterator[None]:
+        """Rank the call with this key by job's priority too, while inside.
+
+        Wrap the wait for a call that is shared between documents, so the
+        call is scheduled as soon as any of them would be.
+
+        Args:
+            key (Hashable): The key the shared call passes to slot()
+            job (DocumentJob): A document waiting on the shared call
+        """
+        with self._cond:
+            self._sharing.setdefault(key, []).append(job)
+            # A queued call with this key may now be next in line
+            self._cond.notify_all()
+        try:
+            yield
+        finally:
+            with self._cond:
+                jobs = self._sharing[key]
+                jobs.remove(job)
+                if not jobs:
+                    del self._sharing[key]
+
+    def advance(self, job: DocumentJob, tokens: int) -> None:
+        """Record that a chunk of the document has been processed.
+
+        Args:
+            job (DocumentJob): The document the chunk belongs to
+            tokens (int): Estimated tokens of the processed chunk
+        """
+        with self._cond:
+            job.remaining_tokens = max(job.remaining_tokens - tokens, 0)
+
+    def _acquire(self, job: DocumentJob, key: Optional[Hashable]) -> None:
+        with self._cond:
+            ticket = _Ticket(job=job, seq=next(self._seq), key=key)
+            self._waiting.append(ticket)
+            while self._next_ticket() is not ticket:
+                self._cond.wait()
+            self._waiting.remove(ticket)
+            self._running += 1
+            self._running_per_client[job.client_id] = (
+                self._running_per_client.get(job.client_id, 0) + 1
+            )
+            # Waiters that checked while this ticket was still queued may now
+            # be next in line for a remaining free slot
+            self._cond.notify_all()
+
+    def _release(self, job: DocumentJob) -> None:
+        with self._cond:
+            self._running -= 1
+            self._running_per_client[job.client_id] -= 1
+            if not self._running_per_client[job.client_id]:
+                del self._running_per_client[job.client_id]
+            self._cond.notify_all()
+
+    def _next_ticket(self) -> Optional[_Ticket]:
+        """Pick the waiting ticket that should run next, if a slot is free.
+
+        Must be called with the condition held.
+        """
+        if self._running >= self.max_concurrent:
+            return None
+
+        now = time.monotonic()
+        best: Optional[_Ticket] = None
+        best_key = None
+        for ticket in self._waiting:
+            client_id = ticket.job.client_id
+            # Requests without a client id aren't one client, so they only
+            # share the global limit
+            if (
+                self.client_quota is not None
+                and client_id is not None
+                and self._running_per_client.get(client_id, 0) >= self.client_quota
+            ):
+                continue
+            remaining = ticket.job.remaining_tokens
+            for job in self._sharing.get(ticket.key, ()):
+                remaining = min(remaining, job.remaining_tokens)
+            priority = remaining - self.aging_tokens_per_second * (
+                now - ticket.enqueued
+            )
+            key = (priority, ticket.seq)
+            if best_key is None or key < best_key:
+                best, best_key = ticket, key
+        return best
+
+    def stats(self) -> Dict[str, int]:
+        """Return the current number of running and waiting model calls."""
+        with self._cond:
+            return {"running": self._running, "waiting": len(self._waiting)}
@@ -0,0 +1,224 @@
+"""
+Multi-process server for the extraction API.
+
+Imports the app (and with it the Extractor) once in a parent process, then
+forks worker processes that share the listening socket. Workers start with
+the model and everything else already loaded, and share those pages with the
+parent copy-on-write instead of each loading their own copy. The parent
+restarts workers that die and shuts all of them down on SIGTERM/SIGINT.
+
+PDF parsing is CPU-bound and holds the GIL, so a single uvicorn process only
+ever uses one core; one worker per available CPU uses all of them. The worker
+count is passed to the app as SERVE_WORKERS so it can split its model call
+limits between the workers.
+
+Usage:
+    python -m src.serve
+
+Environment:
+    WEB_CONCURRENCY: Number of worker processes (default: available CPUs,
+        capped by the container's CPU quota)
+    PORT: Port to listen on (default: 8080)
+"""
+
+import gc
+import math
+import os
+import signal
+import socket
+import time
+from loguru import logger
+from typing import Dict, Optional
+
+import uvicorn
+from fastapi import FastAPI
+
+logger = logger.bind(name="serve")
+
+# Workers that die faster than this after starting are not restarted in a loop
+MIN_WORKER_LIFETIME = 1.0
+
+CGROUP_V2_CPU_MAX = "/sys/fs/cgroup/cpu.max"
+CGROUP_V1_CFS_QUOTA = "/sys/fs/cgroup/cpu/cpu.cfs_quota_us"
+CGROUP_V1_CFS_PERIOD = "/sys/fs/cgroup/cpu/cpu.cfs_period_us"
+
+
+def _cgroup_cpu_limit() -> Optional[int]:
+    """Return the cgroup CPU quota rounded up to whole CPUs, if one is set.
+
+    Cloud Run and most container runtimes limit CPU with a CFS quota rather
+    than a cpuset, which CPU affinity doesn't reflect.
+    """
+    try:
+        # cgroup v2: "<quota> <period>", quota is "max" when unlimited
+        with open(CGROUP_V2_CPU_MAX) as cpu_max:
+            quota, period = cpu_max.read().split()[:2]
+        if quota == "max":
+            return None
+        quota, period = int(quota), int(period)
+    except (OSError, ValueError):
+        try:
+            # cgroup v1: quota is -1 when unlimited
+            with open(CGROUP_V1_CFS_QUOTA) as cfs_quota:
+                quota = int(cfs_quota.read())
+            with open(CGROUP_V1_CFS_PERIOD) as cfs_period:
+                period = int(cfs_period.read())
+        except (OSError, ValueError):
+            return None
+        if quota <= 0:
+            return None
+
+    if period <= 0:
+        return None
+    return max(1, math.ceil(quota / period))
+
+
+def default_workers() -> int:
+    """Return the number of CPUs this process may use.
+
+    Takes CPU affinity and container cpusets into account, unlike
+    os.cpu_count(), and caps the result by the cgroup CPU quota.
+    """
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+
+    limit = _cgroup_cpu_limit()
+    return min(cpus, limit) if limit else cpus
+
+
+def _bind(host: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _run_worker(app: FastAPI, sock: socket.socket) -> None:
+    """Serve requests on the shared socket until told to stop."""
+    # The parent's handlers would make workers try to supervise themselves
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    config = uvicorn.Config(app)
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def _worker_main(app: FastAPI, sock: socket.socket) -> None:
+    """Run a forked worker and exit its process; never returns.
+
+    Exits with a non-zero status if the worker fails, so the parent sees and
+    logs the failure instead of a clean exit.
+    """
+    code = 0
+    try:
+        _run_worker(app, sock)
+    except SystemExit as e:
+        code = e.code if isinstance(e.code, int) else 1
+    except BaseException:
+        logger.exception(f"Worker {os.getpid()} failed")
+        code = 1
+    finally:
+        # Never fall back into the parent's supervision loop
+        os._exit(code)
+
+
+def serve(
+    app: FastAPI,
+    host: str = "0.0.0.0",
+    port: int = 8080,
+    workers: Optional[int] = None,
+) -> None:
+    """Fork workers serving an already imported app and supervise them.
+
+    Args:
+        app (FastAPI): The fully initialized application
+        host (str): Interface to bind
+        port (int): Port to bind
+        workers (Optional[int]): Number of worker processes. Defaults to the
+            number of available CPUs.
+
+    Raises:
+        ValueError: If workers is not positive
+    """
+    workers = workers or default_workers()
+    if workers <= 0:
+        raise ValueError("workers must be a positive number")
+
+    # Nothing may open gRPC channels or threads before this point: the parent
+    # never calls the model, so each worker creates its own channel lazily
+    sock = _bind(host, port)
+    # Move everything loaded so far out of the GC's reach so collections in
+    # the workers don't write to (and so un-share) the preloaded pages
+    gc.freeze()
+
+    children: Dict[int, float] = {}
+    stopping = False
+
+    def spawn() -> None:
+        pid = os.fork()
+        if pid == 0:
+            _worker_main(app, sock)
+        children[pid] = time.monotonic()
+
+    def stop(signum, _frame) -> None:
+        nonlocal stopping
+        stopping = True
+        logger.info(f"Received signal {signum}, stopping {len(children)} workers")
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    logger.info(f"Starting {workers} workers on {host}:{port}")
+    for _ in range(workers):
+        spawn()
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        started = children.pop(pid, None)
+        if stopping or started is None:
+            continue
+
+        logger.warning(
+            f"Worker {pid} exited with status {os.waitstatus_to_exitcode(status)}"
+        )
+        if time.monotonic() - started < MIN_WORKER_LIFETIME:
+            # Crashing on startup; back off instead of fork-bombing
+            time.sleep(MIN_WORKER_LIFETIME)
+        spawn()
+
+    sock.close()
+    logger.info("All workers stopped")
+
+
+def main() -> None:
+    workers = int(os.getenv("WEB_CONCURRENCY") or default_workers())
+    if workers <= 0:
+        raise ValueError("WEB_CONCURRENCY must be a positive number")
+    # Lets the app split its model call limits between the workers
+    os.environ["SERVE_WORKERS"] = str(workers)
+
+    # Importing the app initializes the Extractor and caches before forking
+    from src.app import app
+
+    serve(
+        app,
+        port=int(os.getenv("PORT", "8080")),
+        workers=workers,
+    )
+
+
+if __name__ == "__main__":
+    main()
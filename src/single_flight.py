@@ -0,0 +1,137 @@
+import asyncio
+import threading
+from dataclasses import dataclass, field
+from loguru import logger
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+logger = logger.bind(name="single_flight")
+
+
+@dataclass
+class _Call:
+    """An in-flight call that duplicate callers wait on."""
+
+    done: threading.Event = field(default_factory=threading.Event)
+    result: Any = None
+    error: Optional[BaseException] = None
+    waiters: int = 0
+
+
+class SingleFlight:
+    """Coalesces concurrent calls that share a key into a single execution.
+
+    The first caller for a key runs the function; callers arriving with the
+    same key while it is still running block until it finishes and receive
+    the same result (or exception). Nothing is cached once the call returns,
+    so a later call with the same key runs the function again.
+
+    Callers get the very same result object, so anything that mutates it must
+    copy it first.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+
+    def do(self, key: Hashable, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run fn(*args, **kwargs), or wait for an in-flight call with this key.
+
+        Args:
+            key (Hashable): Identifies calls that are interchangeable
+            fn (Callable[..., Any]): The function to run if no call is in flight
+
+        Returns:
+            Any: The result of the (possibly shared) call
+
+        Raises:
+            Exception: Whatever the shared call raised
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                call.waiters += 1
+
+        if not leader:
+            logger.debug("Joining in-flight call")
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            if call.waiters:
+                logger.info(f"Shared one call with {call.waiters} duplicate(s)")
+            call.done.set()
+
+    def in_flight(self) -> int:
+        """Return the number of keys currently being computed."""
+        with self._lock:
+            return len(self._calls)
+
+
+@dataclass
+class _AsyncCall:
+    """An in-flight task that duplicate callers await."""
+
+    task: "asyncio.Future[Any]"
+    waiters: int = 0
+
+
+class AsyncSingleFlight:
+    """Coalesces concurrent coroutine calls that share a key on one event loop.
+
+    The asyncio counterpart of SingleFlight: duplicates await the first
+    caller's task instead of blocking a thread, so a burst of retries doesn't
+    tie up the threadpool. The shared task is shielded, so one caller
+    disconnecting doesn't cancel the work for the others.
+    """
+
+    def __init__(self) -> None:
+        self._calls: Dict[Hashable, _AsyncCall] = {}
+
+    async def do(
+        self, key: Hashable, fn: Callable[..., Awaitable[Any]], *args, **kwargs
+    ) -> Any:
+        """Await fn(*args, **kwargs), or an in-flight call with this key.
+
+        Args:
+            key (Hashable): Identifies calls that are interchangeable
+            fn (Callable[..., Awaitable[Any]]): Coroutine function to run if
+                no call is in flight
+
+        Returns:
+            Any: The result of the (possibly shared) call
+
+        Raises:
+            Exception: Whatever the shared call raised
+        """
+        call = self._calls.get(key)
+        if call is None:
+            call = _AsyncCall(task=asyncio.ensure_future(fn(*args, **kwargs)))
+            self._calls[key] = call
+            call.task.add_done_callback(lambda _: self._finish(key, call))
+        else:
+            logger.debug("Joining in-flight call")
+            call.waiters += 1
+        return await asyncio.shield(call.task)
+
+    def _finish(self, key: Hashable, call: _AsyncCall) -> None:
+        if self._calls.get(key) is call:
+            del self._calls[key]
+        if call.waiters:
+            logger.info(f"Shared one call with {call.waiters} duplicate(s)")
+
+    def in_flight(self) -> int:
+        """Return the number of keys currently being computed."""
+        return len(self._calls)
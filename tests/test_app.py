@@ -1,6 +1,11 @@
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
 import os
+import threading
+import time
 import pytest
+from fastapi import HTTPException
 from fastapi.testclient import TestClient
 from unittest.mock import patch, MagicMock
 
@@ -26,7 +31,10 @@ for p in patches:
     p.start()
 
 # 5. Import App Under Test
-from src.app import app
+from src.app import app, inflight_requests, request_key
+from src.entity_index import EntityIndex
+from src.models import EntityBatch
+from src.result_cache import ResultCache
 
 # 6. Clean Up Patches
 for p in patches:
@@ -77,3 +85,273 @@ def test_extract_valid_pdf():
 
         assert response.status_code == 200
         assert isinstance(response.json(), list)
+
+
+def test_request_key_depends_on_content():
+    assert request_key(b"%PDF-a") == request_key(b"%PDF-a")
+    assert request_key(b"%PDF-a") != request_key(b"%PDF-b")
+
+
+def test_concurrent_identical_uploads_are_coalesced():
+    release = threading.Event()
+    calls = []
+
+    def slow_process_pdf(content, filename, client_id=None):
+        calls.append(filename)
+        release.wait(timeout=5)
+        return EntityBatch.from_dicts(
+            [{"entity": "CCR5", "context": "CCR5 context", "start": 0, "end": 4}]
+        )
+
+    def upload(shared_client):
+        files = {"file": ("same.pdf", b"%PDF-same", "application/pdf")}
+        return shared_client.post("/api/v1/extract", files=files)
+
+    # Coalescing happens per event loop, so all requests must share one, as
+    # they do under uvicorn
+    with patch("src.app.process_pdf", side_effect=slow_process_pdf), TestClient(
+        app
+    ) as shared_client:
+        with ThreadPoolExecutor(max_workers=3) as pool:
+            futures = [pool.submit(upload, shared_client) for _ in range(3)]
+            deadline = time.monotonic() + 5
+            key = request_key(b"%PDF-same")
+            while (
+                inflight_requests._calls.get(key) is None
+                or inflight_requests._calls[key].waiters < 2
+            ):
+                assert time.monotonic() < deadline, "duplicates never joined"
+            release.set()
+            responses = [f.result() for f in futures]
+
+    assert len(calls) == 1
+    assert all(r.status_code == 200 for r in responses)
+    assert all(r.json()[0]["entity"] == "CCR5" for r in responses)
+
+
+def test_extract_returns_serialized_batch():
+    batch = EntityBatch.from_dicts(
+        [{"entity": "CCR5", "context": "Mutations in CCR5", "start": 13, "end": 17}]
+    )
+    files = {"file": ("batch.pdf", b"%PDF-batch", "application/pdf")}
+    with patch("src.app.process_pdf", return_value=batch):
+        response = client.post("/api/v1/extract", files=files)
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/json"
+    assert response.json() == [
+        {"entity": "CCR5", "context": "Mutations in CCR5", "start": 13, "end": 17}
+    ]
+
+
+def test_profiling_requires_admin_token():
+    files = {"file": ("valid.pdf", b"%PDF-profile", "application/pdf")}
+    with patch("src.app.PROFILE_ADMIN_TOKEN", "secret"):
+        response = client.post(
+            "/api/v1/extract?profile=true",
+            files=files,
+            headers={"X-Admin-Token": "wrong"},
+        )
+    assert response.status_code == 403
+
+
+def test_profiling_disabled_without_configured_token():
+    files = {"file": ("valid.pdf", b"%PDF-profile", "application/pdf")}
+    with patch("src.app.PROFILE_ADMIN_TOKEN", None):
+        response = client.post(
+            "/api/v1/extract", files=files, headers={"X-Profile": "true"}
+        )
+    assert response.status_code == 403
+
+
+def test_profiled_request_returns_profile_inline():
+    batch = EntityBatch.from_dicts(
+        [{"entity": "CCR5", "context": "Mutations in CCR5", "start": 13, "end": 17}]
+    )
+    files = {"file": ("valid.pdf", b"%PDF-profile", "application/pdf")}
+    with patch("src.app.PROFILE_ADMIN_TOKEN", "secret"), patch(
+        "src.app.PROFILE_DIR", None
+    ), patch("src.app.process_pdf", return_value=batch):
+        response = client.post(
+            "/api/v1/extract?profile=true",
+            files=files,
+            headers={"X-Admin-Token": "secret"},
+        )
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["entities"][0]["entity"] == "CCR5"
+    assert "stats" in body["profile"]
+
+
+def test_profiled_request_saves_profile(tmp_path):
+    batch = EntityBatch.from_dicts([])
+    files = {"file": ("valid.pdf", b"%PDF-profile", "application/pdf")}
+    with patch("src.app.PROFILE_ADMIN_TOKEN", "secret"), patch(
+        "src.app.PROFILE_DIR", str(tmp_path)
+    ), patch("src.app.process_pdf", return_value=batch):
+        response = client.post(
+            "/api/v1/extract",
+            files=files,
+            headers={"X-Admin-Token": "secret", "X-Profile": "true"},
+        )
+
+    assert response.status_code == 200
+    assert response.json() == []
+    assert Path(response.headers["X-Profile-Path"]).exists()
+
+
+def test_search_disabled_without_index():
+    with patch("src.app.entity_index", None):
+        response = client.get("/api/v1/entities/search?q=CCR5")
+        context = client.get("/api/v1/entities/contexts/1")
+    assert response.status_code == 404
+    assert context.status_code == 404
+
+
+def test_extracted_entities_are_searchable(tmp_path):
+    index = EntityIndex(tmp_path / "entities.db")
+    batch = EntityBatch.from_dicts(
+        [{"entity": "CCR5", "context": "Mutations in CCR5", "start": 13, "end": 17}]
+    )
+    files = {"file": ("indexed.pdf", b"%PDF-indexed", "application/pdf")}
+
+    with patch("src.app.entity_index", index), patch(
+        "src.app.PDFParser"
+    ) as parser, patch("src.app.extractor") as mock_extractor:
+        parser.return_value.parse_pdf.return_value = "Mutations in CCR5"
+        mock_extractor.extract_entity_batch.return_value = batch
+        assert client.post("/api/v1/extract", files=files).status_code == 200
+
+        response = client.get(
+            "/api/v1/entities/search", params={"q": "ccr", "mode": "prefix"}
+        )
+        bad_mode = client.get(
+            "/api/v1/entities/search", params={"q": "ccr", "mode": "fuzzy"}
+        )
+        context = client.get(
+            f"/api/v1/entities/contexts/{response.json()[0]['context_id']}"
+        )
+        missing_context = client.get("/api/v1/entities/contexts/999999")
+
+    index.close()
+    assert response.status_code == 200
+    assert response.json()[0]["entity"] == "CCR5"
+    assert (
+        response.json()[0]["document_id"] == hashlib.sha256(b"%PDF-indexed").hexdigest()
+    )
+    assert bad_mode.status_code == 400
+    assert context.json()["context"] == "Mutations in CCR5"
+    assert missing_context.status_code == 404
+
+
+def test_reextracting_without_entities_clears_index(tmp_path):
+    index = EntityIndex(tmp_path / "entities.db")
+    batches = [
+        EntityBatch.from_dicts(
+            [{"entity": "CCR5", "context": "Mutations in CCR5", "start": 13, "end": 17}]
+        ),
+        EntityBatch.from_dicts([]),
+    ]
+    files = {"file": ("stale.pdf", b"%PDF-stale", "application/pdf")}
+
+    with patch("src.app.entity_index", index), patch(
+        "src.app.PDFParser"
+    ) as parser, patch("src.app.extractor") as mock_extractor:
+        parser.return_value.parse_pdf.return_value = "Mutations in CCR5"
+        mock_extractor.extract_entity_batch.side_effect = batches
+        client.post("/api/v1/extract", files=files)
+        before = index.search("CCR5")
+        client.post("/api/v1/extract", files=files)
+        after = index.search("CCR5")
+
+    index.close()
+    assert len(before) == 1
+    assert after == []
+
+
+def test_document_results_are_cached(tmp_path):
+    cache = ResultCache(tmp_path / "cache.db")
+    batch = EntityBatch.from_dicts(
+        [{"entity": "CCR5", "context": "Mutations in CCR5", "start": 13, "end": 17}]
+    )
+    files = {"file": ("cached.pdf", b"%PDF-cached", "application/pdf")}
+
+    with patch("src.app.result_cache", cache), patch(
+        "src.app.process_pdf", return_value=batch
+    ) as process:
+        first = client.post("/api/v1/extract", files=files)
+        second = client.post("/api/v1/extract", files=files)
+
+    cache.close()
+    assert process.call_count == 1
+    assert first.json() == second.json()
+
+
+def test_duplicate_in_another_worker_waits_for_its_result(tmp_path):
+    cache = ResultCache(tmp_path / "cache.db")
+    # Stands in for another worker process extracting the same document
+    other_worker = ResultCache(tmp_path / "cache.db")
+    cache_key = f"document:{request_key(b'%PDF-elsewhere')}"
+    body = b'[{"entity":"CCR5","context":"Mutations in CCR5","start":13,"end":17}]'
+    token = other_worker.claim(cache_key, ttl=60)
+    assert token is not None
+
+    def finish_elsewhere():
+        other_worker.set(cache_key, body)
+        other_worker.release(cache_key, token)
+
+    finisher = threading.Timer(0.2, finish_elsewhere)
+    files = {"file": ("elsewhere.pdf", b"%PDF-elsewhere", "application/pdf")}
+    with patch("src.app.result_cache", cache), patch("src.app.process_pdf") as process:
+        finisher.start()
+        response = client.post("/api/v1/extract", files=files)
+    finisher.join()
+
+    cache.close()
+    other_worker.close()
+    assert process.call_count == 0
+    assert response.json()[0]["entity"] == "CCR5"
+
+
+def test_document_lease_released_on_failure(tmp_path):
+    cache = ResultCache(tmp_path / "cache.db")
+    files = {"file": ("failing.pdf", b"%PDF-failing", "application/pdf")}
+    failure = HTTPException(status_code=422, detail="Failed to parse PDF content")
+
+    with patch("src.app.result_cache", cache), patch(
+        "src.app.process_pdf", side_effect=failure
+    ):
+        response = client.post("/api/v1/extract", files=files)
+
+    assert response.status_code == 422
+    assert cache.claim(f"document:{request_key(b'%PDF-failing')}", ttl=60)
+    cache.close()
+
+
+def test_document_lease_outlasts_its_ttl_while_extracting(tmp_path):
+    cache = ResultCache(tmp_path / "cache.db")
+    other_worker = ResultCache(tmp_path / "cache.db")
+    cache_key = f"document:{request_key(b'%PDF-slow')}"
+    batch = EntityBatch.from_dicts(
+        [{"entity": "CCR5", "context": "Mutations in CCR5", "start": 13, "end": 17}]
+    )
+    takeovers = []
+
+    def slow_process_pdf(content, filename, client_id=None):
+        # Well past the lease's TTL, as for a large document
+        time.sleep(1)
+        takeovers.append(other_worker.claim(cache_key, ttl=60))
+        return batch
+
+    files = {"file": ("slow.pdf", b"%PDF-slow", "application/pdf")}
+    with patch("src.app.result_cache", cache), patch(
+        "src.app.DOCUMENT_LEASE_SECONDS", 0.3
+    ), patch("src.app.process_pdf", side_effect=slow_process_pdf):
+        response = client.post("/api/v1/extract", files=files)
+
+    assert response.status_code == 200
+    assert takeovers == [None]
+    assert other_worker.claim(cache_key, ttl=60) is not None
+    cache.close()
+    other_worker.close()
@@ -0,0 +1,73 @@
+import pytest
+from src.entity_index import EntityIndex, normalize_entity
+from src.models import EntityBatch
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = EntityIndex(tmp_path / "entities.db")
+    yield index
+    index.close()
+
+
+def make_batch(*mentions):
+    return EntityBatch.from_dicts(
+        {"entity": entity, "context": context, "start": start, "end": start + 4}
+        for entity, context, start in mentions
+    )
+
+
+def test_normalize_entity():
+    assert normalize_entity("  CCR5\n receptor ") == "ccr5 receptor"
+
+
+def test_exact_search_across_documents(index):
+    index.add_document("doc-a", make_batch(("CCR5", "CCR5 in paper A", 0)))
+    index.add_document("doc-b", make_batch(("ccr5", "ccr5 in paper B", 10)))
+    index.add_document("doc-c", make_batch(("CCR5-delta32", "Other paper", 0)))
+
+    results = index.search("Ccr5")
+
+    assert [r["document_id"] for r in results] == ["doc-a", "doc-b"]
+    assert results[1]["start"] == 10
+    assert index.get_context(results[0]["context_id"]) == "CCR5 in paper A"
+
+
+def test_prefix_search(index):
+    index.add_document(
+        "doc-a",
+        make_batch(
+            ("CCR5", "ctx", 0), ("CCR5-delta32", "ctx", 8), ("CXCR4", "ctx", 20)
+        ),
+    )
+
+    results = index.search("ccr", mode="prefix", include_context=True)
+
+    assert [r["entity"] for r in results] == ["CCR5", "CCR5-delta32"]
+    assert results[0]["context"] == "ctx"
+
+
+def test_reindexing_replaces_document(index):
+    index.add_document("doc-a", make_batch(("CCR5", "old", 0)))
+    index.add_document("doc-a", make_batch(("HIV", "new", 0)))
+
+    assert index.search("CCR5") == []
+    assert len(index.search("HIV")) == 1
+
+
+def test_index_persists_across_instances(tmp_path):
+    path = tmp_path / "entities.db"
+    first = EntityIndex(path)
+    first.add_document("doc-a", make_batch(("CCR5", "ctx", 0)))
+    first.close()
+
+    reopened = EntityIndex(path)
+    assert len(reopened.search("ccr5")) == 1
+    reopened.close()
+
+
+def test_invalid_search(index):
+    with pytest.raises(ValueError):
+        index.search("")
+    with pytest.raises(ValueError):
+        index.search("ccr5", mode="fuzzy")
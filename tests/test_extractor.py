@@ -1,6 +1,11 @@
+import threading
+import time
 import pytest
+from concurrent.futures import ThreadPoolExecutor
 from unittest.mock import patch, Mock
 from src.extractor import Extractor
+from src.result_cache import ResultCache
+from src.scheduler import ModelCallScheduler
 
 
 def create_mock_response(entities):
@@ -90,3 +95,110 @@ def test_invalid_paragraph_type(extractor):
     results = extractor.process_text()
     # Should only process the valid paragraph
     assert len(results) >= 0  # Depends on if entities were found in valid paragraph
+
+
+def test_identical_paragraphs_share_model_call(extractor):
+    release = threading.Event()
+    started = threading.Event()
+    text = "The patient shows signs of hypertension."
+
+    def slow_generate(prompt):
+        if text in prompt:
+            started.set()
+            release.wait(timeout=5)
+        return create_mock_response(["hypertension"])
+
+    extractor.model.generate_content.side_effect = slow_generate
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        first = pool.submit(extractor.extract_entities, text)
+        started.wait(timeout=5)
+        second = pool.submit(extractor.extract_entities, "Intro.\n" + text)
+        # Let the duplicate paragraph join the in-flight call
+        deadline = time.monotonic() + 5
+        while extractor._inflight_paragraphs._calls[text].waiters < 1:
+            assert time.monotonic() < deadline, "duplicate never joined"
+        release.set()
+        first_results, second_results = first.result(), second.result()
+
+    prompts = [c.args[0] for c in extractor.model.generate_content.call_args_list]
+    assert sum(text in prompt for prompt in prompts) == 1
+    # Offsets are adjusted per document, not shared between them
+    assert second_results[-1]["start"] == first_results[0]["start"] + len("Intro.\n")
+
+
+def test_model_calls_go_through_scheduler(extractor):
+    extractor.scheduler = ModelCallScheduler(max_concurrent=1)
+    extractor.extract_entities("First paragraph.\nSecond paragraph.")
+
+    assert extractor.model.generate_content.call_count == 2
+    assert extractor.scheduler.stats() == {"running": 0, "waiting": 0}
+
+
+def test_shared_heading_does_not_inherit_large_documents_priority(extractor):
+    scheduler = extractor.scheduler = ModelCallScheduler(max_concurrent=1)
+    extractor.model.generate_content.side_effect = lambda _prompt: (
+        time.sleep(0.005) or create_mock_response(["hypertension"])
+    )
+    documents = {
+        "thesis": ["Introduction"] + [f"thesis {i} " + "x" * 4000 for i in range(20)],
+        "small": ["small 0 " + "x" * 400, "small 1 " + "x" * 400],
+        "small-shared": ["Introduction", "shared 1 " + "x" * 400],
+    }
+    for m in range(4):
+        documents[f"medium-{m}"] = [f"medium {m} {i} " + "x" * 2000 for i in range(3)]
+    finished = []
+
+    def extract(name):
+        extractor.extract_entities_from_paragraphs(documents[name])
+        finished.append(name)
+
+    def wait_until(condition, message):
+        deadline = time.monotonic() + 5
+        while not condition():
+            assert time.monotonic() < deadline, message
+
+    with ThreadPoolExecutor(max_workers=len(documents)) as pool:
+        with scheduler.slot(scheduler.submit(["blocker"])):
+            # The thesis leads the shared "Introduction" call, queued behind
+            # the blocker at the thesis's priority
+            pool.submit(extract, "thesis")
+            wait_until(lambda: scheduler.stats()["waiting"] == 1, "thesis not queued")
+            futures = [
+                pool.submit(extract, name) for name in documents if name != "thesis"
+            ]
+            wait_until(
+                lambda: scheduler.stats()["waiting"] == 6
+                and extractor._inflight_paragraphs._calls["Introduction"].waiters,
+                "documents never queued",
+            )
+        for future in futures:
+            future.result(timeout=10)
+
+    medium_positions = [finished.index(f"medium-{m}") for m in range(4)]
+    assert finished.index("small") < min(medium_positions)
+    assert finished.index("small-shared") < min(medium_positions)
+
+
+def test_paragraph_results_are_cached(extractor, tmp_path):
+    extractor.cache = ResultCache(tmp_path / "cache.db")
+    text = "The patient shows signs of hypertension."
+
+    first = extractor.extract_entities(text)
+    second = extractor.extract_entities(text)
+
+    assert extractor.model.generate_content.call_count == 1
+    assert first == second
+    extractor.cache.close()
+
+
+def test_split_pages_matches_split_text(extractor):
+    pages = ["First paragraph.\n\nSecond", "Third paragraph.\n"]
+    assert extractor.split_pages_into_paragraphs(iter(pages)) == (
+        extractor.split_into_paragraphs("\n".join(pages))
+    )
+
+
+def test_extract_from_paragraphs(extractor):
+    results = extractor.extract_entities_from_paragraphs(["hypertension noted"])
+    assert results[0]["context"] == "hypertension noted"
@@ -0,0 +1,53 @@
+import json
+from src.models import Entity, EntityBatch
+
+
+def make_entities(count, per_paragraph=10):
+    return [
+        {
+            "entity": f"entity-{i}",
+            "context": f'paragraph {i // per_paragraph} with "quotes" and é',
+            "start": i,
+            "end": i + 5,
+        }
+        for i in range(count)
+    ]
+
+
+def test_batch_round_trips_to_entity_json():
+    items = make_entities(25)
+    batch = EntityBatch.from_dicts(items)
+
+    assert len(batch) == 25
+    assert json.loads(batch.to_json_bytes()) == items
+
+
+def test_batch_matches_pydantic_serialization():
+    items = make_entities(5)
+    batch = EntityBatch.from_dicts(items)
+    expected = [Entity(**item).model_dump() for item in items]
+    assert json.loads(batch.to_json_bytes()) == expected
+
+
+def test_batch_deduplicates_contexts():
+    batch = EntityBatch.from_dicts(make_entities(100, per_paragraph=10))
+    assert len(batch.contexts) == 10
+
+
+def test_batch_skips_invalid_entities():
+    batch = EntityBatch.from_dicts(
+        [
+            {"entity": "valid", "context": "ctx", "start": "1", "end": 4},
+            {"entity": "missing end", "context": "ctx", "start": 1},
+            {"entity": None, "context": "ctx", "start": 1, "end": 2},
+            {"entity": "bad start", "context": "ctx", "start": "x", "end": 2},
+            {"entity": "fraction", "context": "ctx", "start": 4.7, "end": 6},
+            {"entity": "huge", "context": "ctx", "start": 2**63, "end": 2**63 + 4},
+            "not a dict",
+        ]
+    )
+    assert list(batch) == [{"entity": "valid", "context": "ctx", "start": 1, "end": 4}]
+
+
+def test_empty_batch_serializes_to_empty_list():
+    assert EntityBatch().to_json_bytes() == b"[]"
@@ -1,6 +1,7 @@
 import pytest
 from pathlib import Path
 from src.pdf_parser import PDFParser
+from tests.utils import write_text_pdf
 
 
 @pytest.fixture
@@ -31,3 +32,57 @@ def test_parse_corrupt_pdf(pdf_parser, test_files_dir):
 def test_parse_nonexistent_pdf(pdf_parser):
     with pytest.raises(ValueError):
         pdf_parser.parse_pdf("nonexistent.pdf")
+
+
+def test_low_memory_matches_default(test_files_dir):
+    default = PDFParser().parse_pdf(test_files_dir / "valid.pdf")
+    low_memory = PDFParser(low_memory=True).parse_pdf(test_files_dir / "valid.pdf")
+    assert low_memory == default
+
+
+def test_low_memory_empty_pdf(test_files_dir):
+    assert PDFParser(low_memory=True).parse_pdf(test_files_dir / "empty.pdf") == ""
+
+
+def test_iter_pages_streams_each_page(tmp_path):
+    pdf_path = write_text_pdf(tmp_path / "pages.pdf", 5)
+    pages = list(PDFParser(low_memory=True).iter_pages(pdf_path))
+    assert len(pages) == 5
+    assert "Page 3" in pages[2]
+
+
+def test_low_memory_peak_rss_stays_flat(tmp_path):
+    small = write_text_pdf(tmp_path / "small.pdf", 20)
+    large = write_text_pdf(tmp_path / "large.pdf", 400)
+
+    parser = PDFParser(low_memory=True)
+    # Warm up pdfplumber/pdfminer so import-time allocations aren't measured
+    parser.parse_pdf(small)
+    parser.parse_pdf(small)
+    small_peak = parser.peak_memory_delta
+    parser.parse_pdf(large)
+    large_peak = parser.peak_memory_delta
+
+    # 20x the pages must not mean 20x the memory: allow a fixed 16MB of
+    # allocator noise on top of the small document's peak
+    assert large_peak <= small_peak + 16 * 1024 * 1024
+
+
+@pytest.mark.parametrize("low_memory", [True, False])
+def test_memory_ceiling_enforced(tmp_path, monkeypatch, low_memory):
+    pdf_path = write_text_pdf(tmp_path / "pages.pdf", 3)
+    readings = iter([0, 10 * 1024 * 1024, 20 * 1024 * 1024])
+    monkeypatch.setattr("src.pdf_parser._current_rss_bytes", lambda: next(readings))
+
+    with pytest.raises(RuntimeError, match="Memory limit exceeded"):
+        PDFParser(low_memory=low_memory, max_memory_mb=5).parse_pdf(pdf_path)
+
+
+def test_iter_pages_translates_errors():
+    with pytest.raises(ValueError):
+        list(PDFParser(low_memory=True).iter_pages("nonexistent.pdf"))
+
+
+def test_invalid_memory_ceiling():
+    with pytest.raises(ValueError):
+        PDFParser(low_memory=True, max_memory_mb=0)
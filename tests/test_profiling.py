@@ -0,0 +1,68 @@
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from src.profiling import run_profiled
+
+
+def allocate(count):
+    return [str(i) * 10 for i in range(count)]
+
+
+def test_run_profiled_returns_result_and_report():
+    result, report = run_profiled(allocate, 1000)
+
+    assert len(result) == 1000
+    assert "allocate" in report.stats
+    assert report.allocations
+    assert report.peak_memory > 0
+    assert not tracemalloc.is_tracing()
+
+
+def test_run_profiled_propagates_errors():
+    def failing():
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError, match="boom"):
+        run_profiled(failing)
+    assert not tracemalloc.is_tracing()
+
+
+def test_overlapping_profiled_calls():
+    first_running = threading.Event()
+    release_first = threading.Event()
+
+    def first():
+        first_running.set()
+        release_first.wait(timeout=5)
+        return allocate(1000)
+
+    def second():
+        release_first.set()
+        # Let the first profile finish and stop tracing if it is going to
+        time.sleep(0.2)
+        return allocate(1000)
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        first_future = pool.submit(run_profiled, first)
+        assert first_running.wait(timeout=5)
+        second_future = pool.submit(run_profiled, second)
+        # Don't deadlock if profiled calls are serialized
+        time.sleep(0.2)
+        release_first.set()
+        reports = [first_future.result(), second_future.result()]
+
+    for result, report in reports:
+        assert len(result) == 1000
+        assert report.allocations
+        assert report.peak_memory > 0
+    assert not tracemalloc.is_tracing()
+
+
+def test_report_save_writes_files(tmp_path):
+    _, report = run_profiled(allocate, 10)
+    paths = report.save(tmp_path / "profiles", "request")
+
+    assert (tmp_path / "profiles" / "request.prof").exists()
+    assert "Top allocation sites" in open(paths["summary"]).read()
@@ -0,0 +1,127 @@
+import os
+import threading
+import time
+import pytest
+from src.result_cache import ResultCache
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = ResultCache(tmp_path / "cache.db")
+    yield cache
+    cache.close()
+
+
+def test_get_and_set(cache):
+    assert cache.get("missing") is None
+    cache.set("key", b"value")
+    assert cache.get("key") == b"value"
+
+
+def test_evicts_oldest_entries(tmp_path):
+    cache = ResultCache(tmp_path / "cache.db", max_entries=50)
+    for i in range(200):
+        cache.set(f"key-{i}", b"value")
+
+    assert len(cache) <= 50 + 100
+    assert cache.get("key-0") is None
+    assert cache.get("key-199") == b"value"
+    cache.close()
+
+
+def test_evicts_oldest_entries_over_byte_limit(tmp_path):
+    cache = ResultCache(tmp_path / "cache.db", max_bytes=10_000)
+    for i in range(50):
+        cache.set(f"key-{i}", b"x" * 1000)
+
+    # Checked every max_bytes / 10 written, so at most one value over
+    assert cache.size_bytes() <= 10_000 + 1000
+    assert cache.get("key-0") is None
+    assert cache.get("key-49") == b"x" * 1000
+    cache.close()
+
+
+def test_lease_excludes_other_workers(tmp_path, cache):
+    other_worker = ResultCache(tmp_path / "cache.db")
+
+    token = cache.claim("key", ttl=60)
+    assert token is not None
+    assert other_worker.claim("key", ttl=60) is None
+    cache.release("key", token)
+    assert other_worker.claim("key", ttl=60) is not None
+    other_worker.close()
+
+
+def test_expired_lease_can_be_taken_over(tmp_path, cache):
+    other_worker = ResultCache(tmp_path / "cache.db")
+
+    stale = cache.claim("key", ttl=0.01)
+    time.sleep(0.02)
+    assert other_worker.claim("key", ttl=60) is not None
+    assert cache.claim("key", ttl=60) is None
+    assert not cache.renew("key", stale, ttl=60)
+    other_worker.close()
+
+
+def test_release_leaves_another_owners_lease(tmp_path, cache):
+    second_worker = ResultCache(tmp_path / "cache.db")
+    third_worker = ResultCache(tmp_path / "cache.db")
+
+    stale = cache.claim("key", ttl=0.01)
+    time.sleep(0.02)
+    assert second_worker.claim("key", ttl=60) is not None
+    # The first worker finishing must not drop the second worker's lease
+    cache.release("key", stale)
+    assert third_worker.claim("key", ttl=60) is None
+    second_worker.close()
+    third_worker.close()
+
+
+def test_hold_renews_lease_past_its_ttl(tmp_path, cache):
+    other_worker = ResultCache(tmp_path / "cache.db")
+    token = cache.claim("key", ttl=0.3)
+
+    with cache.hold("key", token, ttl=0.3):
+        time.sleep(1)
+        assert other_worker.claim("key", ttl=60) is None
+
+    assert other_worker.claim("key", ttl=60) is not None
+    other_worker.close()
+
+
+def test_wait_for_release(tmp_path, cache):
+    other_worker = ResultCache(tmp_path / "cache.db")
+    token = cache.claim("key", ttl=60)
+
+    releaser = threading.Timer(0.1, cache.release, args=("key", token))
+    releaser.start()
+    start = time.monotonic()
+    other_worker.wait_for_release("key", poll_interval=0.01)
+
+    assert time.monotonic() - start >= 0.1
+    assert other_worker.claim("key", ttl=60) is not None
+    releaser.join()
+    other_worker.close()
+
+
+def test_shared_with_forked_workers(cache):
+    cache.set("from-parent", b"computed in parent")
+    pid = os.fork()
+    if pid == 0:
+        # The child gets its own connection to the same file
+        cache.set("from-worker", b"computed in a worker")
+        os._exit(0 if cache.get("from-parent") == b"computed in parent" else 1)
+
+    _, status = os.waitpid(pid, 0)
+    assert os.waitstatus_to_exitcode(status) == 0
+    assert cache.get("from-worker") == b"computed in a worker"
+
+
+def test_invalid_max_entries(tmp_path):
+    with pytest.raises(ValueError):
+        ResultCache(tmp_path / "cache.db", max_entries=0)
+
+
+def test_invalid_max_bytes(tmp_path):
+    with pytest.raises(ValueError):
+        ResultCache(tmp_path / "cache.db", max_bytes=0)
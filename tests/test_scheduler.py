@@ -0,0 +1,147 @@
+import threading
+import time
+import pytest
+from src.scheduler import ModelCallScheduler, estimate_tokens
+
+
+def wait_for_waiting(scheduler, count):
+    deadline = time.monotonic() + 5
+    while scheduler.stats()["waiting"] < count:
+        assert time.monotonic() < deadline, "chunks never queued"
+
+
+def run_chunk(scheduler, job, name, order):
+    with scheduler.slot(job):
+        order.append(name)
+
+
+def queue_behind_blocker(scheduler, jobs):
+    """Hold the only slot, queue one chunk per job, then free the slot."""
+    order = []
+    blocker = scheduler.submit(["blocker"])
+    with scheduler.slot(blocker):
+        threads = []
+        for name, job in jobs:
+            thread = threading.Thread(
+                target=run_chunk, args=(scheduler, job, name, order)
+            )
+            thread.start()
+            threads.append(thread)
+            wait_for_waiting(scheduler, len(threads))
+            # Make enqueue times distinguishable for the aging rule
+            time.sleep(0.01)
+    for thread in threads:
+        thread.join(timeout=5)
+    return order
+
+
+def test_estimate_tokens_grows_with_length():
+    assert estimate_tokens("a" * 4000) > estimate_tokens("a" * 40)
+
+
+def test_small_document_runs_first():
+    scheduler = ModelCallScheduler(max_concurrent=1)
+    thesis = scheduler.submit(["x" * 4000] * 300)
+    abstract = scheduler.submit(["x" * 400] * 2)
+
+    order = queue_behind_blocker(
+        scheduler, [("thesis", thesis), ("abstract", abstract)]
+    )
+
+    assert order == ["abstract", "thesis"]
+
+
+def test_waiting_time_prevents_starvation():
+    # With aggressive aging the long-waiting chunk wins despite its size
+    scheduler = ModelCallScheduler(max_concurrent=1, aging_tokens_per_second=1e9)
+    thesis = scheduler.submit(["x" * 4000] * 300)
+    abstract = scheduler.submit(["x" * 400] * 2)
+
+    order = queue_behind_blocker(
+        scheduler, [("thesis", thesis), ("abstract", abstract)]
+    )
+
+    assert order == ["thesis", "abstract"]
+
+
+def run_shared_chunk(scheduler, job, key, name, order):
+    with scheduler.slot(job, key=key):
+        order.append(name)
+
+
+def test_shared_call_runs_at_best_waiting_priority():
+    scheduler = ModelCallScheduler(max_concurrent=1)
+    thesis = scheduler.submit(["x" * 4000] * 300)
+    medium = scheduler.submit(["x" * 2000] * 3)
+    abstract = scheduler.submit(["x" * 400] * 2)
+    order = []
+
+    # The abstract waits on a call the thesis leads, e.g. a shared heading
+    with scheduler.sharing("Introduction", abstract):
+        with scheduler.slot(scheduler.submit(["blocker"])):
+            threads = [
+                threading.Thread(
+                    target=run_shared_chunk,
+                    args=(scheduler, thesis, "Introduction", "shared", order),
+                ),
+                threading.Thread(
+                    target=run_chunk, args=(scheduler, medium, "medium", order)
+                ),
+            ]
+            for count, thread in enumerate(threads, 1):
+                thread.start()
+                wait_for_waiting(scheduler, count)
+        for thread in threads:
+            thread.join(timeout=5)
+
+    assert order == ["shared", "medium"]
+
+
+def test_advance_reduces_remaining_cost():
+    scheduler = ModelCallScheduler()
+    job = scheduler.submit(["first", "second"])
+    before = job.remaining_tokens
+    scheduler.advance(job, estimate_tokens("first"))
+    assert job.remaining_tokens == before - estimate_tokens("first")
+
+
+def test_client_quota_limits_concurrent_slots():
+    scheduler = ModelCallScheduler(max_concurrent=4, client_quota=1)
+    first = scheduler.submit(["chunk"], client_id="batch")
+    second = scheduler.submit(["chunk"], client_id="batch")
+    other = scheduler.submit(["chunk"], client_id="interactive")
+    order = []
+
+    with scheduler.slot(first):
+        quota_bound = threading.Thread(
+            target=run_chunk, args=(scheduler, second, "batch", order)
+        )
+        quota_bound.start()
+        wait_for_waiting(scheduler, 1)
+        # Another client still gets a free slot immediately
+        run_chunk(scheduler, other, "interactive", order)
+        assert order == ["interactive"]
+        assert scheduler.stats() == {"running": 1, "waiting": 1}
+    quota_bound.join(timeout=5)
+
+    assert order == ["interactive", "batch"]
+
+
+def test_anonymous_requests_are_not_one_quota_bucket():
+    scheduler = ModelCallScheduler(max_concurrent=4, client_quota=1)
+    first = scheduler.submit(["chunk"])
+    second = scheduler.submit(["chunk"])
+    order = []
+
+    with scheduler.slot(first):
+        # Would block forever if anonymous requests shared a quota of 1
+        run_chunk(scheduler, second, "anonymous", order)
+
+    assert order == ["anonymous"]
+
+
+def test_invalid_configuration():
+    with pytest.raises(ValueError):
+        ModelCallScheduler(max_concurrent=0)
+    with pytest.raises(ValueError):
+        ModelCallScheduler(client_quota=0)
@@ -0,0 +1,66 @@
+import os
+import socket
+import pytest
+from src import serve
+
+
+@pytest.fixture
+def cgroup(tmp_path, monkeypatch):
+    """Point the cgroup CPU files at tmp_path; returns a writer for them."""
+    paths = {
+        "v2": tmp_path / "cpu.max",
+        "v1_quota": tmp_path / "cpu.cfs_quota_us",
+        "v1_period": tmp_path / "cpu.cfs_period_us",
+    }
+    monkeypatch.setattr(serve, "CGROUP_V2_CPU_MAX", str(paths["v2"]))
+    monkeypatch.setattr(serve, "CGROUP_V1_CFS_QUOTA", str(paths["v1_quota"]))
+    monkeypatch.setattr(serve, "CGROUP_V1_CFS_PERIOD", str(paths["v1_period"]))
+    monkeypatch.setattr(serve.os, "sched_getaffinity", lambda _pid: set(range(8)))
+
+    def write(**contents):
+        for name, content in contents.items():
+            paths[name].write_text(content)
+
+    return write
+
+
+def test_default_workers_without_quota(cgroup):
+    assert serve.default_workers() == 8
+
+
+def test_default_workers_unlimited_v2_quota(cgroup):
+    cgroup(v2="max 100000\n")
+    assert serve.default_workers() == 8
+
+
+@pytest.mark.parametrize(
+    "cpu_max, expected", [("200000 100000\n", 2), ("150000 100000\n", 2)]
+)
+def test_default_workers_capped_by_v2_quota(cgroup, cpu_max, expected):
+    cgroup(v2=cpu_max)
+    assert serve.default_workers() == expected
+
+
+def test_default_workers_capped_by_v1_quota(cgroup):
+    cgroup(v1_quota="100000\n", v1_period="100000\n")
+    assert serve.default_workers() == 1
+
+
+def test_default_workers_unlimited_v1_quota(cgroup):
+    cgroup(v1_quota="-1\n", v1_period="100000\n")
+    assert serve.default_workers() == 8
+
+
+def test_failing_worker_exits_non_zero(monkeypatch):
+    def failing_worker(_app, _sock):
+        raise RuntimeError("startup failed")
+
+    monkeypatch.setattr(serve, "_run_worker", failing_worker)
+    sock = socket.socket()
+    pid = os.fork()
+    if pid == 0:
+        serve._worker_main(None, sock)
+    sock.close()
+
+    _, status = os.waitpid(pid, 0)
+    assert os.waitstatus_to_exitcode(status) == 1
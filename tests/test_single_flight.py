@@ -0,0 +1,113 @@
+import asyncio
+import threading
+import time
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from src.single_flight import AsyncSingleFlight, SingleFlight
+
+
+def wait_for_waiters(flight, key, count):
+    deadline = time.monotonic() + 5
+    while flight._calls.get(key) is None or flight._calls[key].waiters < count:
+        assert time.monotonic() < deadline, "duplicates never joined"
+
+
+def test_concurrent_duplicates_share_one_call():
+    flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def slow(value):
+        calls.append(value)
+        release.wait(timeout=5)
+        return [value]
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        futures = [pool.submit(flight.do, "key", slow, "a") for _ in range(4)]
+        # Wait until every duplicate has joined before letting the leader finish
+        wait_for_waiters(flight, "key", 3)
+        release.set()
+        results = [f.result() for f in futures]
+
+    assert calls == ["a"]
+    assert all(result is results[0] for result in results)
+    assert flight.in_flight() == 0
+
+
+def test_sequential_calls_are_not_cached():
+    flight = SingleFlight()
+    calls = []
+    flight.do("key", calls.append, 1)
+    flight.do("key", calls.append, 2)
+    assert calls == [1, 2]
+
+
+def test_error_propagates_to_duplicates():
+    flight = SingleFlight()
+    release = threading.Event()
+
+    def failing():
+        release.wait(timeout=5)
+        raise ValueError("boom")
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        futures = [pool.submit(flight.do, "key", failing) for _ in range(2)]
+        wait_for_waiters(flight, "key", 1)
+        release.set()
+        for future in futures:
+            with pytest.raises(ValueError, match="boom"):
+                future.result()
+
+    assert flight.in_flight() == 0
+
+
+def test_async_duplicates_await_one_task():
+    flight = AsyncSingleFlight()
+    calls = []
+
+    async def slow(value):
+        calls.append(value)
+        await asyncio.sleep(0.05)
+        return [value]
+
+    async def main():
+        return await asyncio.gather(*(flight.do("key", slow, "a") for _ in range(3)))
+
+    results = asyncio.run(main())
+
+    assert calls == ["a"]
+    assert all(result is results[0] for result in results)
+    assert flight.in_flight() == 0
+
+
+def test_async_cancelled_caller_does_not_cancel_shared_task():
+    flight = AsyncSingleFlight()
+
+    async def slow():
+        await asyncio.sleep(0.05)
+        return "done"
+
+    async def main():
+        first = asyncio.ensure_future(flight.do("key", slow))
+        second = asyncio.ensure_future(flight.do("key", slow))
+        await asyncio.sleep(0)
+        first.cancel()
+        return await second
+
+    assert asyncio.run(main()) == "done"
+
+
+def test_async_error_propagates_to_duplicates():
+    flight = AsyncSingleFlight()
+
+    async def failing():
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    async def main():
+        return await asyncio.gather(
+            *(flight.do("key", failing) for _ in range(2)), return_exceptions=True
+        )
+
+    assert all(isinstance(r, ValueError) for r in asyncio.run(main()))
+    assert flight.in_flight() == 0